@@ -0,0 +1,119 @@
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+class CacheLRU:
+    def __init__(self, taille=1024, ttl=None):
+        self.taille = taille
+        self.ttl = ttl
+        self.succes = 0
+        self.echecs = 0
+        self._entrees = OrderedDict()
+        self._verrou = threading.Lock()
+
+    def obtenir(self, cle):
+        with self._verrou:
+            entree = self._entrees.get(cle)
+            if entree is not None:
+                expiration, valeur = entree
+                if expiration is None or expiration > time.monotonic():
+                    self._entrees.move_to_end(cle)
+                    self.succes += 1
+                    return valeur
+                del self._entrees[cle]
+            self.echecs += 1
+            return None
+
+    def enregistrer(self, cle, valeur):
+        if self.taille <= 0:
+            return
+        expiration = time.monotonic() + self.ttl if self.ttl else None
+        with self._verrou:
+            self._entrees[cle] = (expiration, valeur)
+            self._entrees.move_to_end(cle)
+            while len(self._entrees) > self.taille:
+                self._entrees.popitem(last=False)
+
+    def vider(self):
+        with self._verrou:
+            self._entrees.clear()
+
+    def __len__(self):
+        return len(self._entrees)
+
+
+def connexion_sqlite(local, chemin):
+    # une connexion par fil et par processus : une connexion ouverte avant un fork n'est pas réutilisable
+    connexion = getattr(local, "connexion", None)
+    if connexion is None or local.pid != os.getpid():
+        connexion = sqlite3.connect(chemin, timeout=5, isolation_level=None)
+        connexion.execute("PRAGMA journal_mode=WAL")
+        local.connexion = connexion
+        local.pid = os.getpid()
+    return connexion
+
+
+class CacheSqlite:
+    # Partagé entre processus : chaque processus ouvre sa propre connexion au même fichier
+    def __init__(self, chemin, taille=1024, ttl=None):
+        self.chemin = chemin
+        self.taille = taille
+        self.ttl = ttl
+        self.succes = 0
+        self.echecs = 0
+        self._local = threading.local()
+        with self._connexion() as connexion:
+            connexion.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "cle TEXT PRIMARY KEY, valeur BLOB, expiration REAL, acces REAL)"
+            )
+            connexion.execute("CREATE INDEX IF NOT EXISTS cache_acces ON cache (acces)")
+
+    def _connexion(self):
+        return connexion_sqlite(self._local, self.chemin)
+
+    def obtenir(self, cle):
+        connexion = self._connexion()
+        maintenant = time.time()
+        ligne = connexion.execute(
+            "SELECT valeur FROM cache WHERE cle = ? AND (expiration IS NULL OR expiration > ?)",
+            (cle, maintenant),
+        ).fetchone()
+        if ligne is None:
+            self.echecs += 1
+            return None
+        connexion.execute("UPDATE cache SET acces = ? WHERE cle = ?", (maintenant, cle))
+        self.succes += 1
+        return ligne[0]
+
+    def enregistrer(self, cle, valeur):
+        if self.taille <= 0:
+            return
+        connexion = self._connexion()
+        maintenant = time.time()
+        expiration = maintenant + self.ttl if self.ttl else None
+        connexion.execute(
+            "INSERT OR REPLACE INTO cache (cle, valeur, expiration, acces) VALUES (?, ?, ?, ?)",
+            (cle, valeur, expiration, maintenant),
+        )
+        connexion.execute("DELETE FROM cache WHERE expiration IS NOT NULL AND expiration <= ?", (maintenant,))
+        connexion.execute(
+            "DELETE FROM cache WHERE cle IN "
+            "(SELECT cle FROM cache ORDER BY acces DESC LIMIT -1 OFFSET ?)",
+            (self.taille,),
+        )
+
+    def vider(self):
+        self._connexion().execute("DELETE FROM cache")
+
+    def __len__(self):
+        return self._connexion().execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+
+def creer_cache(taille=1024, ttl=None, chemin=None):
+    if chemin:
+        return CacheSqlite(chemin, taille, ttl)
+    return CacheLRU(taille, ttl)
@@ -20,5 +20,22 @@ def modulo(a, b):
         raise ValueError("Modulo par zéro impossible")
     return a % b
 
+def puissance_modulaire(a, b, n):
+    if n == 0:
+        raise ValueError("Modulo par zéro impossible")
+    if all(isinstance(x, int) for x in (a, b, n)):
+        return pow(a, b, n)
+    return modulo(puissance(a, b), n)
+
 def calcul_complexe(a, b):
     return puissance(a, b) + 10
+
+OPERATIONS = {
+    "addition": addition,
+    "soustraction": soustraction,
+    "multiplication": multiplication,
+    "division": division,
+    "puissance": puissance,
+    "modulo": modulo,
+    "calcul_complexe": calcul_complexe,
+}
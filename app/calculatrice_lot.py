@@ -0,0 +1,112 @@
+import numpy as np
+
+LIMITE_INT64 = 2 ** 63 - 1
+# au-delà, un entier n'est plus représentable exactement en float64
+LIMITE_FLOAT_EXACT = 2 ** 53
+
+
+def _flottant64(x):
+    # les fonctions scalaires calculent en float Python, c'est-à-dire en float64
+    if x.dtype.kind == "f" and x.dtype.itemsize < 8:
+        return x.astype(np.float64)
+    return x
+
+def _operandes(a, b):
+    # np.asarray ne copie pas les tableaux ni les objets exposant le protocole buffer
+    return _flottant64(np.asarray(a)), _flottant64(np.asarray(b))
+
+def _entiers(a, b):
+    return a.dtype.kind in "iub" and b.dtype.kind in "iub"
+
+def _borne(x):
+    # plus grande valeur absolue, en entier Python pour ne pas déborder
+    if x.size == 0:
+        return 0
+    return max(abs(int(x.min())), abs(int(x.max())))
+
+def _promouvoir(a, b, borne_resultat):
+    # int64 si le résultat tient à coup sûr, sinon entiers Python (dtype object) comme les fonctions scalaires
+    if borne_resultat <= LIMITE_INT64:
+        return a.astype(np.int64, copy=False), b.astype(np.int64, copy=False)
+    return a.astype(object), b.astype(object)
+
+def addition_lot(a, b):
+    a, b = _operandes(a, b)
+    if _entiers(a, b):
+        a, b = _promouvoir(a, b, _borne(a) + _borne(b))
+    return np.asarray(np.add(a, b))
+
+def soustraction_lot(a, b):
+    a, b = _operandes(a, b)
+    if _entiers(a, b):
+        a, b = _promouvoir(a, b, _borne(a) + _borne(b))
+    return np.asarray(np.subtract(a, b))
+
+def multiplication_lot(a, b):
+    a, b = _operandes(a, b)
+    if _entiers(a, b):
+        a, b = _promouvoir(a, b, _borne(a) * _borne(b))
+    return np.asarray(np.multiply(a, b))
+
+def division_lot(a, b):
+    a, b = _operandes(a, b)
+    if _entiers(a, b) and max(_borne(a), _borne(b)) > LIMITE_FLOAT_EXACT:
+        a, b = a.astype(object), b.astype(object)
+    erreurs = np.broadcast_to(b == 0, np.broadcast_shapes(a.shape, b.shape))
+    if a.dtype.kind == "O" or b.dtype.kind == "O":
+        # sur des tableaux 0-d de dtype object, les ufuncs renvoient un scalaire Python
+        resultat = np.asarray(np.true_divide(a, np.where(b == 0, 1, b))).astype(np.float64)
+        resultat[erreurs] = np.nan
+        return resultat, erreurs
+    resultat = np.full(erreurs.shape, np.nan, dtype=np.result_type(a, b, np.float64))
+    np.true_divide(a, b, out=resultat, where=~erreurs)
+    return resultat, erreurs
+
+def puissance_lot(a, b):
+    a, b = _operandes(a, b)
+    if np.any((a == 0) & (b < 0)):
+        raise ZeroDivisionError("0.0 cannot be raised to a negative power")
+    if _entiers(a, b):
+        if np.any(b < 0):
+            # comme en Python, un exposant entier négatif donne un résultat flottant
+            a = a.astype(np.float64)
+        else:
+            base, exposant = _borne(a), _borne(b)
+            if base <= 1 or base.bit_length() * exposant <= 63:
+                a, b = _promouvoir(a, b, base ** exposant)
+            else:
+                a, b = a.astype(object), b.astype(object)
+            return np.asarray(np.power(a, b))
+    # écart connu : une base négative et un exposant fractionnaire donnent nan, là où Python renvoie un complexe
+    with np.errstate(over="ignore", invalid="ignore"):
+        resultat = np.asarray(np.power(a, b))
+    if resultat.dtype.kind == "f" and np.any(np.isinf(resultat) & np.isfinite(a) & np.isfinite(b)):
+        # Python lève OverflowError là où NumPy renvoie inf
+        raise OverflowError(34, "Numerical result out of range")
+    return resultat
+
+def modulo_lot(a, b):
+    a, b = _operandes(a, b)
+    if _entiers(a, b):
+        a, b = _promouvoir(a, b, max(_borne(a), _borne(b)))
+    erreurs = np.broadcast_to(b == 0, np.broadcast_shapes(a.shape, b.shape))
+    if a.dtype.kind == "O":
+        resultat = np.asarray(np.remainder(a, np.where(b == 0, 1, b)))
+        resultat[erreurs] = 0
+        return resultat, erreurs
+    resultat = np.zeros(erreurs.shape, dtype=np.result_type(a, b))
+    np.remainder(a, b, out=resultat, where=~erreurs)
+    return resultat, erreurs
+
+def calcul_complexe_lot(a, b):
+    return addition_lot(puissance_lot(a, b), 10)
+
+OPERATIONS_LOT = {
+    "addition": addition_lot,
+    "soustraction": soustraction_lot,
+    "multiplication": multiplication_lot,
+    "division": division_lot,
+    "puissance": puissance_lot,
+    "modulo": modulo_lot,
+    "calcul_complexe": calcul_complexe_lot,
+}
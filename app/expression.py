@@ -0,0 +1,239 @@
+import re
+from functools import lru_cache
+
+import numpy as np
+
+from app.calculatrice import OPERATIONS
+from app.calculatrice_lot import OPERATIONS_LOT
+from app.ordonnanceur import Ordonnanceur, estimer_cout
+
+OPERATEURS = {
+    "+": "addition",
+    "-": "soustraction",
+    "*": "multiplication",
+    "/": "division",
+    "%": "modulo",
+    "^": "puissance",
+}
+
+PRIORITES = {"+": 1, "-": 1, "*": 2, "/": 2, "%": 2, "^": 4}
+PRIORITE_UNAIRE = 3
+
+SEUIL_PLIAGE_BITS = 1 << 16
+
+MESSAGES_ERREUR = {
+    "division": "Division par zéro impossible",
+    "modulo": "Modulo par zéro impossible",
+}
+
+# les calculs coûteux d'une évaluation scalaire passent par lui, comme ceux de la calculatrice web
+ordonnanceur = Ordonnanceur()
+
+JETON = re.compile(r"\s*(?:(\d+\.\d*|\.\d+|\d+)([eE][+-]?\d+)?|([A-Za-z_]\w*)|(\S))")
+
+
+def decouper(formule):
+    jetons = []
+    position = 0
+    formule = formule.rstrip()
+    while position < len(formule):
+        correspondance = JETON.match(formule, position)
+        nombre, exposant, nom, symbole = correspondance.groups()
+        if nombre is not None:
+            texte = nombre + (exposant or "")
+            valeur = float(texte) if "." in texte or exposant else int(texte)
+            jetons.append(("nombre", valeur))
+        elif nom is not None:
+            jetons.append(("nom", nom))
+        elif symbole in OPERATEURS or symbole in "(),":
+            jetons.append(("symbole", symbole))
+        else:
+            raise ValueError(f"Expression invalide : caractère inattendu « {symbole} »")
+        position = correspondance.end()
+    return jetons
+
+
+class Analyseur:
+    # Analyse par priorité d'opérateurs ; ^ est associatif à droite et plus prioritaire que le moins unaire
+    def __init__(self, jetons):
+        self.jetons = jetons
+        self.position = 0
+
+    def suivant(self):
+        if self.position < len(self.jetons):
+            return self.jetons[self.position]
+        return (None, None)
+
+    def consommer(self, symbole=None):
+        jeton = self.suivant()
+        if symbole is not None and jeton != ("symbole", symbole):
+            raise ValueError(f"Expression invalide : « {symbole} » attendu")
+        self.position += 1
+        return jeton
+
+    def analyser(self):
+        arbre = self.expression(0)
+        if self.position != len(self.jetons):
+            raise ValueError(f"Expression invalide : « {self.suivant()[1]} » inattendu")
+        return arbre
+
+    def expression(self, priorite_min):
+        gauche = self.unaire()
+        while True:
+            genre, symbole = self.suivant()
+            if genre != "symbole" or symbole not in PRIORITES or PRIORITES[symbole] < priorite_min:
+                return gauche
+            self.consommer()
+            priorite = PRIORITES[symbole]
+            droite = self.expression(priorite if symbole == "^" else priorite + 1)
+            gauche = ("operation", OPERATEURS[symbole], (gauche, droite))
+
+    def unaire(self):
+        if self.suivant() == ("symbole", "-"):
+            self.consommer()
+            return ("operation", "multiplication", (("nombre", -1), self.expression(PRIORITE_UNAIRE)))
+        if self.suivant() == ("symbole", "+"):
+            self.consommer()
+            return self.expression(PRIORITE_UNAIRE)
+        return self.primaire()
+
+    def primaire(self):
+        genre, valeur = self.consommer()
+        if genre == "nombre":
+            return ("nombre", valeur)
+        if genre == "nom":
+            if self.suivant() != ("symbole", "("):
+                return ("variable", valeur)
+            if valeur not in OPERATIONS:
+                raise ValueError(f"Opération inconnue : {valeur}")
+            self.consommer("(")
+            gauche = self.expression(0)
+            self.consommer(",")
+            droite = self.expression(0)
+            self.consommer(")")
+            return ("operation", valeur, (gauche, droite))
+        if (genre, valeur) == ("symbole", "("):
+            arbre = self.expression(0)
+            self.consommer(")")
+            return arbre
+        raise ValueError("Expression invalide : fin inattendue" if genre is None else f"Expression invalide : « {valeur} » inattendu")
+
+
+class Plan:
+    # Registres : variables, puis constantes, puis un registre par instruction
+    def __init__(self, formule, variables, constantes, instructions, sortie):
+        self.formule = formule
+        self.variables = variables
+        self.constantes = constantes
+        self.instructions = instructions
+        self.sortie = sortie
+
+    def _registres(self, valeurs):
+        try:
+            return [valeurs[nom] for nom in self.variables] + list(self.constantes)
+        except KeyError as e:
+            raise ValueError(f"Variable manquante : {e.args[0]}") from None
+
+    def evaluer(self, executer=None, /, **valeurs):
+        # executer(a, operation, b) effectue chaque instruction, comme pour une Feuille
+        executer = executer or _executer_ordonnance
+        registres = self._registres(valeurs)
+        for operation, gauche, droite in self.instructions:
+            registres.append(executer(registres[gauche], operation, registres[droite]))
+        return registres[self.sortie]
+
+    def evaluer_lot(self, /, **colonnes):
+        registres = self._registres({nom: np.asarray(valeur) for nom, valeur in colonnes.items()})
+        for operation, gauche, droite in self.instructions:
+            resultat = OPERATIONS_LOT[operation](registres[gauche], registres[droite])
+            if operation in MESSAGES_ERREUR:
+                resultat, erreurs = resultat
+                if erreurs.any():
+                    raise ValueError(MESSAGES_ERREUR[operation])
+            registres.append(resultat)
+        return np.asarray(registres[self.sortie])
+
+    def __repr__(self):
+        return f"Plan({self.formule!r}, {len(self.instructions)} instructions)"
+
+
+def _executer_ordonnance(a, operation, b):
+    return ordonnanceur.executer(OPERATIONS[operation], a, b)
+
+
+class Compilateur:
+    def __init__(self):
+        self.variables = []
+        self.constantes = []
+        self.instructions = []
+        self.registres = {}
+
+    def registre(self, cle, creer):
+        if cle not in self.registres:
+            self.registres[cle] = creer()
+        return self.registres[cle]
+
+    def compiler(self, arbre):
+        genre = arbre[0]
+        if genre == "nombre":
+            return ("constante", arbre[1])
+        if genre == "variable":
+            return ("variable", arbre[1])
+        operation, (gauche, droite) = arbre[1], arbre[2]
+        gauche, droite = self.compiler(gauche), self.compiler(droite)
+        fonction = OPERATIONS[operation]
+        if gauche[0] == droite[0] == "constante" and estimer_cout(fonction, gauche[1], droite[1]) <= SEUIL_PLIAGE_BITS:
+            try:
+                return ("constante", fonction(gauche[1], droite[1]))
+            except (ValueError, ArithmeticError):
+                # l'erreur doit apparaître à l'évaluation, pas à la compilation
+                pass
+        return ("instruction", operation, gauche, droite)
+
+    def emettre(self, noeud):
+        genre = noeud[0]
+        if genre == "variable":
+            return self.registre(noeud, lambda: self._ajouter("variables", noeud[1]))
+        if genre == "constante":
+            # repr distingue 1 de 1.0 et 0.0 de -0.0
+            cle = ("constante", repr(noeud[1]))
+            return self.registre(cle, lambda: self._ajouter("constantes", noeud[1]))
+        operation, gauche, droite = noeud[1], self.emettre(noeud[2]), self.emettre(noeud[3])
+        cle = ("instruction", operation, gauche, droite)
+        return self.registre(cle, lambda: self._ajouter("instructions", (operation, gauche, droite)))
+
+    def _ajouter(self, zone, element):
+        liste = getattr(self, zone)
+        liste.append(element)
+        return zone, len(liste) - 1
+
+    def plan(self, formule, arbre):
+        sortie = self.emettre(self.compiler(arbre))
+        decalages = {
+            "variables": 0,
+            "constantes": len(self.variables),
+            "instructions": len(self.variables) + len(self.constantes),
+        }
+
+        def adresse(registre):
+            zone, index = registre
+            return decalages[zone] + index
+
+        instructions = tuple((operation, adresse(gauche), adresse(droite)) for operation, gauche, droite in self.instructions)
+        return Plan(formule, tuple(self.variables), tuple(self.constantes), instructions, adresse(sortie))
+
+
+@lru_cache(maxsize=256)
+def compiler(formule):
+    # l'analyse et la compilation sont récursives : une formule trop imbriquée est refusée comme invalide
+    try:
+        arbre = Analyseur(decouper(formule)).analyser()
+        return Compilateur().plan(formule, arbre)
+    except RecursionError:
+        raise ValueError("Expression invalide : formule trop imbriquée") from None
+
+def evaluer(formule, executer=None, /, **valeurs):
+    return compiler(formule).evaluer(executer, **valeurs)
+
+def evaluer_lot(formule, /, **colonnes):
+    return compiler(formule).evaluer_lot(**colonnes)
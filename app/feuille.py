@@ -0,0 +1,389 @@
+import pickle
+import sqlite3
+import sys
+import threading
+import time
+from collections import deque
+from collections.abc import MutableMapping
+
+from app.cache import CacheLRU, connexion_sqlite
+from app.calculatrice import OPERATIONS
+
+
+class ReferenceCirculaire(ValueError):
+    pass
+
+
+class FeuilleOccupee(Exception):
+    # base verrouillée trop longtemps, ou feuille modifiée sans cesse par d'autres requêtes
+    pass
+
+
+class Cellule:
+    def __init__(self, valeur=None, operation=None, operandes=()):
+        self.operation = operation
+        self.operandes = operandes
+        self.valeur = valeur
+        self.erreur = None
+
+    @property
+    def references(self):
+        return {operande for operande in self.operandes if isinstance(operande, str)}
+
+    def etat(self):
+        if self.erreur is not None:
+            return {"erreur": self.erreur}
+        return {"valeur": self.valeur}
+
+
+def _executer_directement(a, operation, b):
+    return OPERATIONS[operation](a, b)
+
+def _trop_grand(valeur):
+    # un entier au-delà de sys.get_int_max_str_digits() ne peut plus être converti en texte ni en JSON
+    limite = sys.get_int_max_str_digits()
+    return isinstance(valeur, int) and limite > 0 and abs(valeur).bit_length() * 0.30103 >= limite
+
+
+class Feuille:
+    # les opérandes d'une formule sont des nombres ou des noms de cellules
+    # executer(a, operation, b) effectue le calcul d'une formule
+    def __init__(self, executer=None, cellules=None, dependants=None):
+        self.cellules = {} if cellules is None else cellules
+        self.dependants = {} if dependants is None else dependants
+        self.executer = executer or _executer_directement
+        self._verrou = threading.RLock()
+
+    def definir_valeur(self, nom, valeur):
+        return self.mettre_a_jour({nom: valeur})
+
+    def definir_formule(self, nom, operation, a, b):
+        return self.mettre_a_jour({nom: {"operation": operation, "a": a, "b": b}})
+
+    def supprimer(self, nom):
+        return self.mettre_a_jour({nom: None})
+
+    def mettre_a_jour(self, definitions):
+        # tout ou rien : en cas d'erreur, les définitions déjà appliquées sont annulées
+        # renvoie l'état des cellules recalculées, dans l'ordre de recalcul
+        with self._verrou:
+            anciennes = []
+            try:
+                for nom, definition in definitions.items():
+                    cellule = self._construire(nom, definition)
+                    anciennes.append((nom, self.cellules.get(nom)))
+                    self._installer(nom, cellule)
+            except ValueError:
+                for nom, ancienne in reversed(anciennes):
+                    self._installer(nom, ancienne)
+                raise
+            ordre = self._recalculer([nom for nom, _ in anciennes])
+            return {nom: self.cellules[nom].etat() for nom in ordre if nom in self.cellules}
+
+    def lire(self, nom=None):
+        with self._verrou:
+            if nom is not None:
+                if nom not in self.cellules:
+                    raise KeyError(nom)
+                return self.cellules[nom].etat()
+            return {nom: cellule.etat() for nom, cellule in self.cellules.items()}
+
+    def _construire(self, nom, definition):
+        if not isinstance(nom, str) or not nom:
+            raise ValueError("Nom de cellule invalide")
+        if definition is None:
+            return None
+        if isinstance(definition, dict):
+            operation = definition.get("operation")
+            if not isinstance(operation, str) or operation not in OPERATIONS:
+                raise ValueError(f"Opération inconnue : {operation}")
+            try:
+                operandes = (self._operande(definition["a"]), self._operande(definition["b"]))
+            except KeyError:
+                raise ValueError("Une formule attend les opérandes a et b") from None
+            cellule = Cellule(operation=operation, operandes=operandes)
+            self._verifier_cycle(nom, cellule.references)
+            return cellule
+        return Cellule(valeur=self._nombre(definition))
+
+    def _installer(self, nom, cellule):
+        ancienne = self.cellules.get(nom)
+        if ancienne is not None:
+            for reference in ancienne.references:
+                self.dependants[reference].discard(nom)
+        if cellule is None:
+            self.cellules.pop(nom, None)
+            return
+        for reference in cellule.references:
+            self.dependants.setdefault(reference, set()).add(nom)
+        self.cellules[nom] = cellule
+
+    def _operande(self, operande):
+        return operande if isinstance(operande, str) else self._nombre(operande)
+
+    def _nombre(self, valeur):
+        if isinstance(valeur, bool) or not isinstance(valeur, (int, float)):
+            raise ValueError("Veuillez entrer des nombres valides.")
+        return valeur
+
+    def _aval(self, noms):
+        vus = set(noms)
+        pile = list(noms)
+        while pile:
+            for dependant in self.dependants.get(pile.pop(), ()):
+                if dependant not in vus:
+                    vus.add(dependant)
+                    pile.append(dependant)
+        return vus
+
+    def _verifier_cycle(self, nom, references):
+        # un cycle apparaît si nom dépend, directement ou non, d'une cellule qui dépend de nom
+        if references & self._aval([nom]):
+            raise ReferenceCirculaire(f"Référence circulaire : {nom}")
+
+    def _recalculer(self, noms):
+        # tri topologique restreint aux cellules touchées : le coût ne dépend pas de la taille de la feuille
+        sales = self._aval(noms)
+        restants = {
+            nom: len(self.cellules[nom].references & sales) if nom in self.cellules else 0
+            for nom in sales
+        }
+        prets = deque(nom for nom, compte in restants.items() if compte == 0)
+        ordre = []
+        while prets:
+            nom = prets.popleft()
+            ordre.append(nom)
+            if nom in self.cellules:
+                self._evaluer(self.cellules[nom])
+            for dependant in self.dependants.get(nom, ()):
+                if dependant in restants:
+                    restants[dependant] -= 1
+                    if restants[dependant] == 0:
+                        prets.append(dependant)
+        return ordre
+
+    def _evaluer(self, cellule):
+        if cellule.operation is None:
+            return
+        cellule.valeur, cellule.erreur = None, None
+        valeurs = []
+        for operande in cellule.operandes:
+            if not isinstance(operande, str):
+                valeurs.append(operande)
+                continue
+            source = self.cellules.get(operande)
+            if source is None:
+                cellule.erreur = f"Cellule inconnue : {operande}"
+                return
+            if source.erreur is not None:
+                cellule.erreur = source.erreur
+                return
+            valeurs.append(source.valeur)
+        try:
+            valeur = self.executer(valeurs[0], cellule.operation, valeurs[1])
+        except Exception as e:
+            cellule.erreur = str(e)
+            return
+        if _trop_grand(valeur):
+            cellule.erreur = "Résultat trop grand pour être affiché"
+        else:
+            cellule.valeur = valeur
+
+
+class StockageFeuillesMemoire:
+    # propre au processus : à réserver à un serveur à un seul processus
+    def __init__(self, taille=1000, ttl=None):
+        self._feuilles = CacheLRU(taille, ttl)
+
+    def _obtenir(self, identifiant):
+        feuille = self._feuilles.obtenir(identifiant)
+        if feuille is None:
+            raise KeyError(identifiant)
+        return feuille
+
+    def lire(self, identifiant):
+        return self._obtenir(identifiant).lire()
+
+    def mettre_a_jour(self, identifiant, definitions, executer=None, creer=False):
+        # à la création, la feuille n'est conservée que si ses définitions sont valides
+        if not creer:
+            return self._obtenir(identifiant).mettre_a_jour(definitions)
+        feuille = Feuille(executer)
+        modifiees = feuille.mettre_a_jour(definitions)
+        self._feuilles.enregistrer(identifiant, feuille)
+        return modifiees
+
+
+_ABSENTE = object()
+
+class _TableSqlite(MutableMapping):
+    # vue d'une table (feuille, nom, donnees) : seules les entrées consultées sont lues, puis réécrites
+    def __init__(self, connexion, table, feuille):
+        self._connexion = connexion
+        self._table = table
+        self._feuille = feuille
+        self._chargees = {}
+
+    def _charger(self, nom):
+        if nom not in self._chargees:
+            ligne = self._connexion.execute(
+                f"SELECT donnees FROM {self._table} WHERE feuille = ? AND nom = ?", (self._feuille, nom)
+            ).fetchone()
+            self._chargees[nom] = _ABSENTE if ligne is None else pickle.loads(ligne[0])
+        return self._chargees[nom]
+
+    def __getitem__(self, nom):
+        valeur = self._charger(nom)
+        if valeur is _ABSENTE:
+            raise KeyError(nom)
+        return valeur
+
+    def __setitem__(self, nom, valeur):
+        self._chargees[nom] = valeur
+
+    def __delitem__(self, nom):
+        self[nom]
+        self._chargees[nom] = _ABSENTE
+
+    def __iter__(self):
+        for nom, donnees in self._connexion.execute(
+            f"SELECT nom, donnees FROM {self._table} WHERE feuille = ?", (self._feuille,)
+        ).fetchall():
+            if nom not in self._chargees:
+                self._chargees[nom] = pickle.loads(donnees)
+        return iter([nom for nom, valeur in self._chargees.items() if valeur is not _ABSENTE])
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def ecrire(self):
+        # les objets lus ont pu être modifiés sur place : tout ce qui a été chargé est réécrit
+        for nom, valeur in self._chargees.items():
+            if valeur is _ABSENTE:
+                self._connexion.execute(
+                    f"DELETE FROM {self._table} WHERE feuille = ? AND nom = ?", (self._feuille, nom)
+                )
+            else:
+                self._connexion.execute(
+                    f"INSERT OR REPLACE INTO {self._table} (feuille, nom, donnees) VALUES (?, ?, ?)",
+                    (self._feuille, nom, pickle.dumps(valeur)),
+                )
+
+
+class StockageFeuillesSqlite:
+    # Partagé entre processus comme CacheSqlite ; une ligne par cellule, pour qu'une mise à jour
+    # ne lise et n'écrive que les cellules touchées, comme le recalcul.
+    # Les calculs se font dans une transaction de lecture, qui ne bloque personne ; l'écriture, brève,
+    # n'aboutit que si la version de la feuille n'a pas changé entre-temps, sinon le calcul est refait
+    def __init__(self, chemin, taille=1000, ttl=None, essais=5):
+        self.chemin = chemin
+        self.taille = taille
+        self.ttl = ttl
+        self.essais = essais
+        self._local = threading.local()
+        connexion = self._connexion()
+        connexion.execute(
+            "CREATE TABLE IF NOT EXISTS feuilles (id TEXT PRIMARY KEY, version INTEGER, expiration REAL, acces REAL)"
+        )
+        connexion.execute("CREATE INDEX IF NOT EXISTS feuilles_acces ON feuilles (acces)")
+        for table in ("cellules", "dependants"):
+            connexion.execute(
+                f"CREATE TABLE IF NOT EXISTS {table} ("
+                "feuille TEXT, nom TEXT, donnees BLOB, PRIMARY KEY (feuille, nom))"
+            )
+
+    def _connexion(self):
+        return connexion_sqlite(self._local, self.chemin)
+
+    def _version(self, connexion, identifiant):
+        ligne = connexion.execute(
+            "SELECT version FROM feuilles WHERE id = ? AND (expiration IS NULL OR expiration > ?)",
+            (identifiant, time.time()),
+        ).fetchone()
+        if ligne is None:
+            raise KeyError(identifiant)
+        return ligne[0]
+
+    def _feuille(self, connexion, identifiant, executer=None):
+        cellules = _TableSqlite(connexion, "cellules", identifiant)
+        dependants = _TableSqlite(connexion, "dependants", identifiant)
+        return Feuille(executer, cellules, dependants)
+
+    def lire(self, identifiant):
+        connexion = self._connexion()
+        try:
+            connexion.execute("BEGIN")
+            try:
+                self._version(connexion, identifiant)
+                etat = self._feuille(connexion, identifiant).lire()
+            finally:
+                connexion.execute("COMMIT")
+            maintenant = time.time()
+            connexion.execute(
+                "UPDATE feuilles SET expiration = ?, acces = ? WHERE id = ?",
+                (maintenant + self.ttl if self.ttl else None, maintenant, identifiant),
+            )
+        except sqlite3.OperationalError as e:
+            raise FeuilleOccupee(str(e)) from e
+        return etat
+
+    def mettre_a_jour(self, identifiant, definitions, executer=None, creer=False):
+        # KeyError si la feuille n'existe pas ; une définition invalide n'écrit rien
+        connexion = self._connexion()
+        try:
+            for _ in range(self.essais):
+                connexion.execute("BEGIN")
+                try:
+                    version = None if creer else self._version(connexion, identifiant)
+                    feuille = self._feuille(connexion, identifiant, executer)
+                    modifiees = feuille.mettre_a_jour(definitions)
+                finally:
+                    connexion.execute("COMMIT")
+                if self._ecrire(connexion, identifiant, feuille, version):
+                    return modifiees
+        except sqlite3.OperationalError as e:
+            raise FeuilleOccupee(str(e)) from e
+        raise FeuilleOccupee("Feuille modifiée par d'autres requêtes pendant le calcul")
+
+    def _ecrire(self, connexion, identifiant, feuille, version):
+        connexion.execute("BEGIN IMMEDIATE")
+        try:
+            maintenant = time.time()
+            expiration = maintenant + self.ttl if self.ttl else None
+            if version is None:
+                connexion.execute(
+                    "INSERT INTO feuilles (id, version, expiration, acces) VALUES (?, 1, ?, ?)",
+                    (identifiant, expiration, maintenant),
+                )
+            elif connexion.execute(
+                "UPDATE feuilles SET version = version + 1, expiration = ?, acces = ? WHERE id = ? AND version = ?",
+                (expiration, maintenant, identifiant, version),
+            ).rowcount == 0:
+                connexion.execute("ROLLBACK")
+                return False
+            feuille.cellules.ecrire()
+            feuille.dependants.ecrire()
+            if version is None:
+                self._purger(connexion, maintenant)
+        except BaseException:
+            connexion.execute("ROLLBACK")
+            raise
+        connexion.execute("COMMIT")
+        return True
+
+    def _purger(self, connexion, maintenant):
+        perimees = connexion.execute(
+            "SELECT id FROM feuilles WHERE expiration IS NOT NULL AND expiration <= ? "
+            "UNION SELECT id FROM (SELECT id FROM feuilles ORDER BY acces DESC LIMIT -1 OFFSET ?)",
+            (maintenant, self.taille),
+        ).fetchall()
+        for (identifiant,) in perimees:
+            for table in ("feuilles", "cellules", "dependants"):
+                colonne = "id" if table == "feuilles" else "feuille"
+                connexion.execute(f"DELETE FROM {table} WHERE {colonne} = ?", (identifiant,))
+
+
+def creer_stockage_feuilles(taille=1000, ttl=None, chemin=None):
+    if chemin:
+        return StockageFeuillesSqlite(chemin, taille, ttl)
+    return StockageFeuillesMemoire(taille, ttl)
@@ -0,0 +1,251 @@
+import bisect
+import glob
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from app.ordonnanceur import CalculInterrompu
+
+SEUILS_DUREE = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+def _echapper(valeur):
+    return str(valeur).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _etiquettes(noms, valeurs):
+    if not noms:
+        return ""
+    return "{" + ",".join(f'{nom}="{_echapper(valeur)}"' for nom, valeur in zip(noms, valeurs)) + "}"
+
+
+class Compteur:
+    type = "counter"
+
+    def __init__(self, nom, aide, etiquettes=()):
+        self.nom = nom
+        self.aide = aide
+        self.etiquettes = etiquettes
+        self._valeurs = {}
+        self._verrou = threading.Lock()
+
+    def incrementer(self, valeur=1, **etiquettes):
+        cle = tuple(etiquettes[nom] for nom in self.etiquettes)
+        with self._verrou:
+            self._valeurs[cle] = self._valeurs.get(cle, 0) + valeur
+
+    def valeur(self, **etiquettes):
+        return self._valeurs.get(tuple(etiquettes[nom] for nom in self.etiquettes), 0)
+
+    def etat(self):
+        with self._verrou:
+            return [[list(cle), valeur] for cle, valeur in self._valeurs.items()]
+
+    def fusionner(self, etats):
+        total = {}
+        for etat in etats:
+            for cle, valeur in etat:
+                total[tuple(cle)] = total.get(tuple(cle), 0) + valeur
+        return total
+
+    def lignes(self, valeurs):
+        for cle, valeur in sorted(valeurs.items()):
+            yield f"{self.nom}{_etiquettes(self.etiquettes, cle)} {valeur}"
+
+
+class Histogramme:
+    type = "histogram"
+
+    def __init__(self, nom, aide, etiquettes=(), seuils=SEUILS_DUREE):
+        self.nom = nom
+        self.aide = aide
+        self.etiquettes = etiquettes
+        self.seuils = tuple(seuils)
+        self._series = {}
+        self._verrou = threading.Lock()
+
+    def observer(self, valeur, **etiquettes):
+        cle = tuple(etiquettes[nom] for nom in self.etiquettes)
+        index = bisect.bisect_left(self.seuils, valeur)
+        with self._verrou:
+            serie = self._series.get(cle)
+            if serie is None:
+                serie = self._series[cle] = [[0] * (len(self.seuils) + 1), 0.0]
+            serie[0][index] += 1
+            serie[1] += valeur
+
+    def compte(self, **etiquettes):
+        serie = self._series.get(tuple(etiquettes[nom] for nom in self.etiquettes))
+        return sum(serie[0]) if serie else 0
+
+    def etat(self):
+        with self._verrou:
+            return [[list(cle), list(comptes), somme] for cle, (comptes, somme) in self._series.items()]
+
+    def fusionner(self, etats):
+        total = {}
+        for etat in etats:
+            for cle, comptes, somme in etat:
+                serie = total.setdefault(tuple(cle), [[0] * len(comptes), 0.0])
+                serie[0] = [a + b for a, b in zip(serie[0], comptes)]
+                serie[1] += somme
+        return total
+
+    def lignes(self, series):
+        noms = self.etiquettes + ("le",)
+        for cle, (comptes, somme) in sorted(series.items()):
+            cumul = 0
+            for seuil, compte in zip(self.seuils + ("+Inf",), comptes):
+                cumul += compte
+                yield f"{self.nom}_bucket{_etiquettes(noms, cle + (seuil,))} {cumul}"
+            yield f"{self.nom}_sum{_etiquettes(self.etiquettes, cle)} {somme}"
+            yield f"{self.nom}_count{_etiquettes(self.etiquettes, cle)} {cumul}"
+
+
+class ValeurExterne:
+    # valeur lue au moment de l'export, par exemple un compteur tenu par le cache
+    def __init__(self, nom, aide, fonction, genre="gauge"):
+        self.nom = nom
+        self.aide = aide
+        self.fonction = fonction
+        self.type = genre
+
+    def etat(self):
+        return self.fonction()
+
+    def fusionner(self, etats):
+        # additionnée entre processus, comme les compteurs
+        return sum(etats)
+
+    def lignes(self, valeur):
+        yield f"{self.nom} {valeur}"
+
+
+class Registre:
+    # avec un dossier, chaque processus y dépose son état et l'export additionne ceux de tous les processus
+    def __init__(self, dossier=None):
+        self.metriques = []
+        self.dossier = dossier
+
+    def configurer(self, dossier):
+        self.dossier = dossier
+
+    def enregistrer(self, metrique):
+        self.metriques.append(metrique)
+        return metrique
+
+    def etat(self):
+        return {metrique.nom: metrique.etat() for metrique in self.metriques}
+
+    def sauvegarder(self):
+        if self.dossier:
+            _ecrire_atomiquement(
+                os.path.join(self.dossier, f"metriques-{os.getpid()}.json"),
+                json.dumps(self.etat()).encode("utf-8"),
+            )
+
+    def _etats(self):
+        if not self.dossier:
+            return [self.etat()]
+        self.sauvegarder()
+        etats = []
+        for chemin in glob.glob(os.path.join(self.dossier, "metriques-*.json")):
+            try:
+                with open(chemin, encoding="utf-8") as fichier:
+                    etats.append(json.load(fichier))
+            except (OSError, ValueError):
+                continue
+        return etats
+
+    def exporter(self):
+        etats = self._etats()
+        lignes = []
+        for metrique in self.metriques:
+            lignes.append(f"# HELP {metrique.nom} {metrique.aide}")
+            lignes.append(f"# TYPE {metrique.nom} {metrique.type}")
+            valeurs = metrique.fusionner([etat[metrique.nom] for etat in etats if metrique.nom in etat])
+            lignes.extend(metrique.lignes(valeurs))
+        return "\n".join(lignes) + "\n"
+
+
+class Synchronisation:
+    # un fil par processus, démarré au premier appel après le fork, qui lance les sauvegardes périodiques
+    def __init__(self, intervalle=1.0):
+        self.intervalle = intervalle
+        self.taches = []
+        self._pid = None
+
+    def ajouter(self, tache):
+        self.taches.append(tache)
+
+    def assurer(self):
+        if self._pid != os.getpid():
+            self._pid = os.getpid()
+            threading.Thread(target=self._boucle, daemon=True).start()
+
+    def _boucle(self):
+        while True:
+            time.sleep(self.intervalle)
+            for tache in self.taches:
+                try:
+                    tache()
+                except OSError:
+                    pass
+
+
+def _ecrire_atomiquement(chemin, donnees):
+    temporaire = f"{chemin}.{os.getpid()}.tmp"
+    with open(temporaire, "wb") as fichier:
+        fichier.write(donnees)
+    os.replace(temporaire, chemin)
+
+
+registre = Registre()
+synchronisation = Synchronisation()
+
+OPERATIONS_TOTAL = registre.enregistrer(Compteur(
+    "calculatrice_operations_total", "Nombre d'appels par opération.", ("operation",)
+))
+ERREURS_TOTAL = registre.enregistrer(Compteur(
+    "calculatrice_erreurs_total", "Nombre d'erreurs par opération et par type.", ("operation", "type")
+))
+DUREE_OPERATION = registre.enregistrer(Histogramme(
+    "calculatrice_operation_duree_secondes", "Durée des opérations.", ("operation",)
+))
+DUREE_PHASE = registre.enregistrer(Histogramme(
+    "calculatrice_requete_phase_duree_secondes", "Durée des phases d'une requête.", ("route", "phase")
+))
+
+
+def type_erreur(exception):
+    if isinstance(exception, CalculInterrompu):
+        return "interrompu"
+    if isinstance(exception, ValueError):
+        message = str(exception)
+        if message.startswith("Division par zéro"):
+            return "division_par_zero"
+        if message.startswith("Modulo par zéro"):
+            return "modulo_par_zero"
+        return "entree_invalide"
+    return type(exception).__name__
+
+@contextmanager
+def mesurer_operation(operation):
+    OPERATIONS_TOTAL.incrementer(operation=operation)
+    debut = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        ERREURS_TOTAL.incrementer(operation=operation, type=type_erreur(e))
+        raise
+    finally:
+        DUREE_OPERATION.observer(time.perf_counter() - debut, operation=operation)
+
+def compter_erreur(operation, genre):
+    ERREURS_TOTAL.incrementer(operation=operation, type=genre)
+
+def observer_phase(route, phase, debut):
+    fin = time.perf_counter()
+    DUREE_PHASE.observer(fin - debut, route=route, phase=phase)
+    return fin
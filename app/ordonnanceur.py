@@ -0,0 +1,94 @@
+import multiprocessing
+import os
+import threading
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+from app.calculatrice import calcul_complexe, multiplication, puissance
+
+
+class CalculInterrompu(ValueError):
+    pass
+
+
+def _bits(x):
+    if isinstance(x, int):
+        return abs(x).bit_length()
+    return 64
+
+def estimer_cout(fonction, a, b):
+    # taille approximative du résultat, en bits
+    if fonction in (puissance, calcul_complexe):
+        if isinstance(a, int) and isinstance(b, int) and b > 0 and abs(a) > 1:
+            return _bits(a) * b
+        return 64
+    if fonction is multiplication:
+        return _bits(a) + _bits(b)
+    return max(_bits(a), _bits(b))
+
+
+def _limiter_memoire(memoire_max):
+    if resource is None or not memoire_max:
+        return
+    try:
+        with open("/proc/self/statm") as statm:
+            deja_utilise = int(statm.read().split()[0]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        deja_utilise = 0
+    limite = deja_utilise + memoire_max
+    resource.setrlimit(resource.RLIMIT_AS, (limite, limite))
+
+def _travailleur(envoi, fonction, args, memoire_max):
+    try:
+        _limiter_memoire(memoire_max)
+        envoi.send((True, fonction(*args)))
+    except MemoryError:
+        envoi.send((False, CalculInterrompu("Calcul interrompu : mémoire insuffisante")))
+    except Exception as e:
+        envoi.send((False, e))
+    finally:
+        envoi.close()
+
+
+class Ordonnanceur:
+    def __init__(self, seuil_bits=1 << 20, processus_max=2, delai=5.0, memoire_max=512 * 1024 * 1024):
+        self.seuil_bits = seuil_bits
+        self.delai = delai
+        self.memoire_max = memoire_max
+        self._places = threading.BoundedSemaphore(processus_max)
+
+    def executer(self, fonction, *args):
+        if estimer_cout(fonction, *args[:2]) <= self.seuil_bits:
+            return fonction(*args)
+        return self._executer_isole(fonction, args)
+
+    def _executer_isole(self, fonction, args):
+        # un processus par appel coûteux : c'est le seul moyen de l'arrêter à l'échéance
+        if not self._places.acquire(timeout=self.delai):
+            raise CalculInterrompu("Calcul interrompu : trop de calculs coûteux en cours")
+        try:
+            reception, envoi = multiprocessing.Pipe(duplex=False)
+            processus = multiprocessing.Process(
+                target=_travailleur, args=(envoi, fonction, args, self.memoire_max), daemon=True
+            )
+            processus.start()
+            envoi.close()
+            try:
+                if not reception.poll(self.delai):
+                    raise CalculInterrompu(f"Calcul interrompu : délai de {self.delai:g} s dépassé")
+                succes, valeur = reception.recv()
+            except EOFError:
+                raise CalculInterrompu("Calcul interrompu : le processus de calcul s'est arrêté") from None
+            finally:
+                if processus.is_alive():
+                    processus.kill()
+                processus.join()
+                reception.close()
+        finally:
+            self._places.release()
+        if not succes:
+            raise valeur
+        return valeur
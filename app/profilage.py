@@ -0,0 +1,125 @@
+import cProfile
+import glob
+import json
+import marshal
+import os
+import pstats
+import random
+import threading
+import time
+
+ETAT = "profilage.json"
+
+
+class ProfilageEchantillonne:
+    # désactivé, le coût par requête se limite à la lecture de self.actif
+    # avec un dossier partagé, l'interrupteur est diffusé à tous les processus et l'export réunit leurs profils
+    def __init__(self, dossier=None, intervalle=1.0):
+        self.dossier = dossier
+        self.intervalle = intervalle
+        self.actif = False
+        self.taux = 0.0
+        self.echeance = None
+        self.generation = None
+        self.requetes = 0
+        self._statistiques = None
+        self._modifie = False
+        self._controle = 0.0
+        self._verrou = threading.Lock()
+
+    def activer(self, taux=0.1, duree=None):
+        with self._verrou:
+            # l'échéance est une heure murale pour avoir le même sens dans tous les processus
+            self._appliquer(True, taux, time.time() + duree if duree else None, time.time_ns())
+            self._publier()
+
+    def desactiver(self):
+        self.actualiser(forcer=True)
+        with self._verrou:
+            self.actif = False
+            self._publier()
+
+    def actualiser(self, forcer=False):
+        # relit l'interrupteur partagé au plus une fois par intervalle
+        if self.dossier is None:
+            return
+        maintenant = time.monotonic()
+        if not forcer and maintenant - self._controle < self.intervalle:
+            return
+        self._controle = maintenant
+        chemin = os.path.join(self.dossier, ETAT)
+        try:
+            with open(chemin, encoding="utf-8") as fichier:
+                etat = json.load(fichier)
+        except (OSError, ValueError):
+            return
+        with self._verrou:
+            self._appliquer(etat["actif"], etat["taux"], etat["echeance"], etat["generation"])
+
+    def _appliquer(self, actif, taux, echeance, generation):
+        if generation != self.generation:
+            self.generation = generation
+            self.requetes = 0
+            self._statistiques = None
+            self._modifie = False
+        self.taux = taux
+        self.echeance = echeance
+        self.actif = actif
+
+    def _publier(self):
+        if self.dossier is None:
+            return
+        etat = {"actif": self.actif, "taux": self.taux, "echeance": self.echeance, "generation": self.generation}
+        chemin = os.path.join(self.dossier, ETAT)
+        temporaire = f"{chemin}.{os.getpid()}.tmp"
+        with open(temporaire, "w", encoding="utf-8") as fichier:
+            json.dump(etat, fichier)
+        os.replace(temporaire, chemin)
+
+    def debut_requete(self):
+        if self.echeance is not None and time.time() > self.echeance:
+            self.actif = False
+            return None
+        if random.random() >= self.taux:
+            return None
+        profil = cProfile.Profile()
+        try:
+            profil.enable()
+        except ValueError:
+            # un autre profileur est déjà actif sur ce fil
+            return None
+        return profil
+
+    def fin_requete(self, profil):
+        profil.disable()
+        with self._verrou:
+            if self._statistiques is None:
+                self._statistiques = pstats.Stats(profil)
+            else:
+                self._statistiques.add(profil)
+            self.requetes += 1
+            self._modifie = True
+
+    def sauvegarder(self):
+        # dépose le profil de ce processus pour la génération en cours
+        with self._verrou:
+            if self.dossier is None or not self._modifie:
+                return
+            chemin = os.path.join(self.dossier, f"profil-{self.generation}-{os.getpid()}.prof")
+            self._statistiques.dump_stats(f"{chemin}.tmp")
+            os.replace(f"{chemin}.tmp", chemin)
+            self._modifie = False
+
+    def exporter(self):
+        # même format que pstats.Stats.dump_stats, lisible par pstats et snakeviz
+        if self.dossier is None:
+            with self._verrou:
+                if self._statistiques is None:
+                    return None
+                return marshal.dumps(self._statistiques.stats)
+        self.actualiser(forcer=True)
+        self.sauvegarder()
+        chemins = glob.glob(os.path.join(self.dossier, f"profil-{self.generation}-*.prof"))
+        if not chemins:
+            return None
+        return marshal.dumps(pstats.Stats(*chemins).stats)
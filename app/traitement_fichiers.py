@@ -0,0 +1,305 @@
+import argparse
+import csv
+import io
+import json
+import mmap
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, as_completed, wait
+
+from app.calculatrice import OPERATIONS
+from app.ordonnanceur import Ordonnanceur
+
+TAILLE_BLOC = 16 * 1024 * 1024
+ENTETE_CSV = "a,operation,b"
+DELAI = 5.0
+
+
+def lire_nombre(texte):
+    if isinstance(texte, (int, float)):
+        return texte
+    try:
+        return int(texte)
+    except (TypeError, ValueError):
+        return float(texte)
+
+def format_fichier(chemin, impose=None):
+    if impose:
+        return impose
+    return "ndjson" if chemin.endswith((".ndjson", ".jsonl")) else "csv"
+
+
+def decouper(chemin, taille_bloc):
+    # blocs alignés sur les fins de ligne ; le découpage ne dépend que du fichier et de la taille de bloc
+    taille = os.path.getsize(chemin)
+    if taille == 0:
+        return []
+    blocs = []
+    with open(chemin, "rb") as fichier, mmap.mmap(fichier.fileno(), 0, access=mmap.ACCESS_READ) as carte:
+        debut = 0
+        while debut < taille:
+            fin = carte.find(b"\n", min(debut + taille_bloc, taille) - 1)
+            fin = taille if fin == -1 else fin + 1
+            blocs.append((debut, fin))
+            debut = fin
+    return blocs
+
+def _lire_bloc(chemin, debut, fin):
+    with open(chemin, "rb") as fichier, mmap.mmap(fichier.fileno(), 0, access=mmap.ACCESS_READ) as carte:
+        return carte[debut:fin]
+
+def compter_lignes(tache):
+    chemin, debut, fin = tache
+    return _lire_bloc(chemin, debut, fin).count(b"\n")
+
+
+def analyser_ligne(ligne, format_entree):
+    if format_entree == "ndjson":
+        try:
+            enregistrement = json.loads(ligne)
+            return enregistrement["a"], enregistrement["operation"], enregistrement["b"]
+        except (KeyError, TypeError, ValueError):
+            raise ValueError("Ligne invalide : objet {a, operation, b} attendu") from None
+    champs = ligne.split(",")
+    if len(champs) != 3:
+        raise ValueError("Ligne invalide : trois champs attendus (a,operation,b)")
+    return champs[0].strip(), champs[1].strip(), champs[2].strip()
+
+_ordonnanceurs = {}
+
+def _ordonnanceur(delai):
+    # un par processus de travail : ses lignes sont traitées une à une, un seul calcul isolé suffit
+    if delai not in _ordonnanceurs:
+        _ordonnanceurs[delai] = Ordonnanceur(delai=delai, processus_max=1)
+    return _ordonnanceurs[delai]
+
+def calculer_ligne(ligne, format_entree, ordonnanceur):
+    try:
+        a, operation, b = analyser_ligne(ligne, format_entree)
+    except ValueError as e:
+        return None, str(e)
+    try:
+        a, b = lire_nombre(a), lire_nombre(b)
+    except (TypeError, ValueError):
+        return None, "Veuillez entrer des nombres valides."
+    fonction = OPERATIONS.get(operation)
+    if fonction is None:
+        return None, f"Opération inconnue : {operation}"
+    try:
+        return ordonnanceur.executer(fonction, a, b), None
+    except Exception as e:
+        return None, str(e)
+
+
+class Ecrivain:
+    def __init__(self, format_sortie):
+        self.format = format_sortie
+        self.tampon = io.StringIO()
+        self.csv = csv.writer(self.tampon, lineterminator="\n")
+
+    def ecrire(self, ligne, cle, valeur):
+        if self.format == "ndjson":
+            self.tampon.write(json.dumps({"ligne": ligne, cle: valeur}) + "\n")
+        else:
+            self.csv.writerow((ligne, valeur))
+
+    def texte(self):
+        return self.tampon.getvalue()
+
+def traiter_bloc(tache):
+    index, chemin, debut, fin, premiere_ligne, format_entree, format_sortie, delai = tache
+    ordonnanceur = _ordonnanceur(delai)
+    resultats, erreurs = Ecrivain(format_sortie), Ecrivain(format_sortie)
+    lignes = 0
+    for numero, ligne in enumerate(_lire_bloc(chemin, debut, fin).decode("utf-8").split("\n"), premiere_ligne):
+        ligne = ligne.rstrip("\r")
+        if not ligne.strip():
+            continue
+        if numero == 1 and format_entree == "csv" and ligne.replace(" ", "") == ENTETE_CSV:
+            continue
+        lignes += 1
+        resultat, erreur = calculer_ligne(ligne, format_entree, ordonnanceur)
+        if erreur is None:
+            try:
+                resultats.ecrire(numero, "resultat", resultat)
+                continue
+            except ValueError:
+                # entier trop long pour être converti en texte (sys.get_int_max_str_digits)
+                erreur = "Résultat trop grand pour être écrit"
+        erreurs.ecrire(numero, "erreur", erreur)
+    return index, resultats.texte(), erreurs.texte(), lignes
+
+
+class PointDeReprise:
+    def __init__(self, chemin, signature):
+        self.chemin = chemin
+        self.signature = signature
+        self.faits = set()
+        self.octets_sortie = 0
+        self.octets_erreurs = 0
+
+    @classmethod
+    def charger(cls, chemin, signature):
+        with open(chemin, encoding="utf-8") as fichier:
+            donnees = json.load(fichier)
+        if donnees["signature"] != signature:
+            raise SystemExit("Le point de reprise ne correspond pas à ce fichier d'entrée.")
+        point = cls(chemin, signature)
+        point.faits = set(donnees["faits"])
+        point.octets_sortie = donnees["octets_sortie"]
+        point.octets_erreurs = donnees["octets_erreurs"]
+        return point
+
+    def sauvegarder(self):
+        temporaire = self.chemin + ".tmp"
+        with open(temporaire, "w", encoding="utf-8") as fichier:
+            json.dump({
+                "signature": self.signature,
+                "faits": sorted(self.faits),
+                "octets_sortie": self.octets_sortie,
+                "octets_erreurs": self.octets_erreurs,
+            }, fichier)
+        os.replace(temporaire, self.chemin)
+
+
+class Progression:
+    def __init__(self, flux=sys.stderr, intervalle=1.0):
+        self.flux = flux
+        self.intervalle = intervalle
+        self.debut = time.monotonic()
+        self.dernier_affichage = 0.0
+        self.lignes = 0
+
+    def avancer(self, lignes, blocs_faits, blocs_total, forcer=False):
+        self.lignes += lignes
+        maintenant = time.monotonic()
+        if not forcer and maintenant - self.dernier_affichage < self.intervalle:
+            return
+        self.dernier_affichage = maintenant
+        debit = self.lignes / max(maintenant - self.debut, 1e-9)
+        self.flux.write(f"\r{self.lignes} lignes, {debit:.0f} lignes/s, bloc {blocs_faits}/{blocs_total}")
+        self.flux.flush()
+
+
+def _ecrire(fichier, texte):
+    donnees = texte.encode("utf-8")
+    fichier.write(donnees)
+    return len(donnees)
+
+def _ouvrir_sortie(chemin, octets):
+    # à la reprise, on coupe ce qui a été écrit après le dernier point de reprise
+    fichier = open(chemin, "r+b" if octets else "wb")
+    fichier.truncate(octets)
+    fichier.seek(octets)
+    return fichier
+
+def _taches(entree, blocs, faits, *parametres):
+    # la numérotation avance au fil de la soumission : pas de passe de comptage préalable sur tout le fichier
+    premiere_ligne = 1
+    for index, (debut, fin) in enumerate(blocs):
+        if index not in faits:
+            yield (index, entree, debut, fin, premiere_ligne, *parametres)
+        premiere_ligne += compter_lignes((entree, debut, fin))
+
+def _executer(executeur, taches, fenetre, ordonne):
+    # au plus `fenetre` blocs soumis et pas encore écrits : la mémoire ne dépend pas de la taille du fichier
+    if ordonne:
+        en_cours = deque()
+        for tache in taches:
+            en_cours.append(executeur.submit(traiter_bloc, tache))
+            if len(en_cours) >= fenetre:
+                yield en_cours.popleft().result()
+        while en_cours:
+            yield en_cours.popleft().result()
+        return
+    en_cours = set()
+    for tache in taches:
+        en_cours.add(executeur.submit(traiter_bloc, tache))
+        if len(en_cours) >= fenetre:
+            termines, en_cours = wait(en_cours, return_when=FIRST_COMPLETED)
+            for futur in termines:
+                yield futur.result()
+    for futur in as_completed(en_cours):
+        yield futur.result()
+
+def traiter_fichier(entree, sortie, erreurs, format_entree=None, format_sortie=None, processus=None,
+                    taille_bloc=TAILLE_BLOC, ordonne=True, reprendre=False, reprise=None, progression=None,
+                    delai=DELAI):
+    format_entree = format_fichier(entree, format_entree)
+    format_sortie = format_fichier(sortie, format_sortie)
+    reprise = reprise or sortie + ".reprise"
+    statistiques = os.stat(entree)
+    signature = [os.path.abspath(entree), statistiques.st_size, statistiques.st_mtime_ns, taille_bloc, ordonne]
+
+    if reprendre and os.path.exists(reprise):
+        point = PointDeReprise.charger(reprise, signature)
+    else:
+        point = PointDeReprise(reprise, signature)
+
+    blocs = decouper(entree, taille_bloc)
+    # pas de multiprocessing.Pool : ses processus sont démons et l'ordonnanceur ne pourrait pas y isoler un calcul
+    processus = processus or os.cpu_count() or 1
+    executeur = ProcessPoolExecutor(processus)
+    try:
+        taches = _taches(entree, blocs, set(point.faits), format_entree, format_sortie, delai)
+        with _ouvrir_sortie(sortie, point.octets_sortie) as fichier_sortie, \
+                _ouvrir_sortie(erreurs, point.octets_erreurs) as fichier_erreurs:
+            if point.octets_sortie == 0 and format_sortie == "csv":
+                point.octets_sortie = _ecrire(fichier_sortie, "ligne,resultat\n")
+                point.octets_erreurs = _ecrire(fichier_erreurs, "ligne,erreur\n")
+            for index, resultats, erreurs_bloc, lignes in _executer(executeur, taches, 2 * processus, ordonne):
+                point.octets_sortie += _ecrire(fichier_sortie, resultats)
+                point.octets_erreurs += _ecrire(fichier_erreurs, erreurs_bloc)
+                for fichier in (fichier_sortie, fichier_erreurs):
+                    fichier.flush()
+                    os.fsync(fichier.fileno())
+                point.faits.add(index)
+                point.sauvegarder()
+                if progression is not None:
+                    progression.avancer(lignes, len(point.faits), len(blocs))
+    finally:
+        # en cas d'interruption, les blocs pas encore commencés sont abandonnés
+        executeur.shutdown(cancel_futures=True)
+
+    if progression is not None:
+        progression.avancer(0, len(point.faits), len(blocs), forcer=True)
+        progression.flux.write("\n")
+    if os.path.exists(reprise):
+        os.remove(reprise)
+
+
+def analyser_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Applique les opérations de la calculatrice à un fichier CSV ou NDJSON")
+    parser.add_argument("entree", help="fichier d'entrée : lignes a,operation,b ou objets {a, operation, b}")
+    parser.add_argument("sortie", help="fichier des résultats")
+    parser.add_argument("--erreurs", help="fichier des lignes en erreur (par défaut : <sortie>.erreurs)")
+    parser.add_argument("--format-entree", choices=("csv", "ndjson"))
+    parser.add_argument("--format-sortie", choices=("csv", "ndjson"))
+    parser.add_argument("--processus", type=int, default=None, help="nombre de processus (par défaut : un par cœur)")
+    parser.add_argument("--taille-bloc", type=int, default=TAILLE_BLOC, help="taille d'un bloc en octets")
+    parser.add_argument("--desordonne", action="store_true", help="écrire les blocs dans l'ordre où ils se terminent")
+    parser.add_argument("--delai", type=float, default=DELAI, help="durée maximale d'un calcul coûteux, en secondes")
+    parser.add_argument("--reprendre", action="store_true", help="reprendre un traitement interrompu")
+    parser.add_argument("--silencieux", action="store_true", help="ne pas afficher la progression")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    options = analyser_arguments(argv)
+    traiter_fichier(
+        options.entree,
+        options.sortie,
+        options.erreurs or options.sortie + ".erreurs",
+        format_entree=options.format_entree,
+        format_sortie=options.format_sortie,
+        processus=options.processus,
+        taille_bloc=options.taille_bloc,
+        ordonne=not options.desordonne,
+        reprendre=options.reprendre,
+        delai=options.delai,
+        progression=None if options.silencieux else Progression(),
+    )
+
+if __name__ == "__main__":
+    main()
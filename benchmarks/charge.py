@@ -0,0 +1,114 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import http.client
+import random
+import threading
+import time
+from urllib.parse import urlencode, urlsplit
+
+from werkzeug.serving import make_server
+
+from app.calculatrice import OPERATIONS
+from web.app_web import app
+from web.serveur import GestionnaireRequetes
+
+def requetes(nombre, graine):
+    hasard = random.Random(graine)
+    operations = list(OPERATIONS)
+    for _ in range(nombre):
+        if hasard.random() < 0.2:
+            yield "GET", None
+        else:
+            corps = {"a": hasard.randint(-1000, 1000), "operation": hasard.choice(operations), "b": hasard.randint(0, 8)}
+            yield "POST", urlencode(corps)
+
+def percentile(valeurs, p):
+    valeurs = sorted(valeurs)
+    if not valeurs:
+        return 0.0
+    rang = (len(valeurs) - 1) * p / 100
+    bas = int(rang)
+    haut = min(bas + 1, len(valeurs) - 1)
+    return valeurs[bas] + (valeurs[haut] - valeurs[bas]) * (rang - bas)
+
+# seules les réponses 200 comptent dans le débit et les latences ; les autres sont des erreurs
+
+def client_en_processus(nombre, graine, latences, erreurs):
+    client = app.test_client()
+    for methode, corps in requetes(nombre, graine):
+        debut = time.perf_counter()
+        if methode == "GET":
+            reponse = client.get("/")
+        else:
+            reponse = client.post("/", data=corps, content_type="application/x-www-form-urlencoded")
+        reponse.get_data()
+        if reponse.status_code == 200:
+            latences.append(time.perf_counter() - debut)
+        else:
+            erreurs.append(reponse.status_code)
+
+def client_socket(hote, port, nombre, graine, latences, erreurs):
+    connexion = http.client.HTTPConnection(hote, port, timeout=30)
+    entetes = {"Content-Type": "application/x-www-form-urlencoded"}
+    for methode, corps in requetes(nombre, graine):
+        debut = time.perf_counter()
+        try:
+            connexion.request(methode, "/", body=corps, headers=entetes if corps else {})
+            reponse = connexion.getresponse()
+            reponse.read()
+        except (OSError, http.client.HTTPException) as e:
+            erreurs.append(type(e).__name__)
+            connexion.close()
+            continue
+        if reponse.status == 200:
+            latences.append(time.perf_counter() - debut)
+        else:
+            erreurs.append(reponse.status)
+    connexion.close()
+
+def lancer(client, args, concurrence, nombre):
+    latences, erreurs = [], []
+    fils = [
+        threading.Thread(target=client, args=(*args, nombre // concurrence, graine, latences, erreurs))
+        for graine in range(concurrence)
+    ]
+    debut = time.perf_counter()
+    for fil in fils:
+        fil.start()
+    for fil in fils:
+        fil.join()
+    duree = time.perf_counter() - debut
+    return latences, erreurs, duree
+
+def resume(prefixe, latences, erreurs, duree):
+    return {
+        f"{prefixe}.erreurs": len(erreurs),
+        f"{prefixe}.debit": len(latences) / duree,
+        f"{prefixe}.p50_ms": percentile(latences, 50) * 1000,
+        f"{prefixe}.p95_ms": percentile(latences, 95) * 1000,
+        f"{prefixe}.p99_ms": percentile(latences, 99) * 1000,
+    }
+
+def executer(nombre=2000, concurrence=4, url=None):
+    resultats = resume("charge.processus", *lancer(client_en_processus, (), concurrence, nombre))
+
+    serveur = None
+    if url is None:
+        serveur = make_server("127.0.0.1", 0, app, threaded=True, request_handler=GestionnaireRequetes)
+        threading.Thread(target=serveur.serve_forever, daemon=True).start()
+        hote, port = "127.0.0.1", serveur.port
+    else:
+        adresse = urlsplit(url)
+        hote, port = adresse.hostname, adresse.port or 80
+    try:
+        resultats.update(resume("charge.socket", *lancer(client_socket, (hote, port), concurrence, nombre)))
+    finally:
+        if serveur is not None:
+            serveur.shutdown()
+    return resultats
+
+if __name__ == "__main__":
+    for cle, valeur in executer().items():
+        print(f"{cle:45} {valeur:12.2f}")
@@ -0,0 +1,71 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import json
+import platform
+
+from benchmarks import charge, micro
+
+def plus_grand_est_mieux(cle):
+    return cle.endswith(".debit")
+
+def comparer(reference, resultats, seuil):
+    regressions = []
+    for cle, valeur in resultats.items():
+        ancienne = reference.get(cle)
+        if not ancienne:
+            continue
+        if plus_grand_est_mieux(cle):
+            ecart = (ancienne - valeur) / ancienne
+        else:
+            ecart = (valeur - ancienne) / ancienne
+        if ecart > seuil:
+            regressions.append((cle, ancienne, valeur, ecart))
+    return regressions
+
+def erreurs(resultats):
+    # un banc dont des requêtes échouent ne mesure rien : il échoue, quelle que soit la référence
+    return [cle for cle, valeur in resultats.items() if cle.endswith(".erreurs") and valeur]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Bancs d'essai de la calculatrice")
+    parser.add_argument("--sans-micro", action="store_true", help="ne pas lancer les micro-bancs")
+    parser.add_argument("--sans-charge", action="store_true", help="ne pas lancer le test de charge")
+    parser.add_argument("--requetes", type=int, default=2000, help="requêtes par mode de charge")
+    parser.add_argument("--concurrence", type=int, default=4, help="clients simultanés")
+    parser.add_argument("--url", help="serveur déjà lancé à charger au lieu du serveur local")
+    parser.add_argument("--enregistrer", metavar="FICHIER", help="enregistrer les résultats comme référence")
+    parser.add_argument("--reference", metavar="FICHIER", help="comparer à une référence enregistrée")
+    parser.add_argument("--seuil", type=float, default=0.2, help="régression tolérée (0.2 = 20 %%)")
+    options = parser.parse_args(argv)
+
+    resultats = {}
+    if not options.sans_micro:
+        resultats.update(micro.executer())
+    if not options.sans_charge:
+        resultats.update(charge.executer(options.requetes, options.concurrence, options.url))
+    for cle, valeur in resultats.items():
+        print(f"{cle:45} {valeur:12.2f}")
+
+    if options.enregistrer:
+        with open(options.enregistrer, "w", encoding="utf-8") as fichier:
+            json.dump({"machine": platform.platform(), "resultats": resultats}, fichier, indent=2)
+
+    en_erreur = erreurs(resultats)
+    for cle in en_erreur:
+        print(f"ÉCHEC {cle} : {resultats[cle]} requêtes sans réponse 200")
+
+    if options.reference:
+        with open(options.reference, encoding="utf-8") as fichier:
+            reference = json.load(fichier)["resultats"]
+        regressions = comparer(reference, resultats, options.seuil)
+        for cle, ancienne, valeur, ecart in regressions:
+            print(f"RÉGRESSION {cle} : {ancienne:.2f} -> {valeur:.2f} ({ecart:+.0%})")
+        if regressions:
+            return 1
+    return 1 if en_erreur else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,47 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import random
+import timeit
+
+from app.calculatrice import OPERATIONS, puissance_modulaire
+
+def operandes():
+    hasard = random.Random(42)
+    jeux = {
+        "int": (123456, 789),
+        "float": (1234.5678, 3.21),
+    }
+    for bits in (64, 1024, 16384):
+        a = hasard.getrandbits(bits) | (1 << (bits - 1))
+        # diviseur de taille voisine pour que a / b reste représentable en flottant
+        jeux[f"entier_{bits}"] = (a, hasard.getrandbits(bits - 8) | 1)
+    return jeux
+
+def exposant(nom_jeu):
+    # on garde un exposant petit pour mesurer la taille des opérandes, pas celle du résultat
+    return 1.5 if nom_jeu == "float" else 3
+
+def mesurer(fonction, *args, duree_min=0.02):
+    minuteur = timeit.Timer("f(*args)", globals={"f": fonction, "args": args})
+    nombre = 1
+    while minuteur.timeit(nombre) < duree_min:
+        nombre *= 10
+    meilleur = min(minuteur.repeat(repeat=3, number=nombre))
+    return meilleur / nombre * 1e9
+
+def executer(duree_min=0.02):
+    resultats = {}
+    for nom_jeu, (a, b) in operandes().items():
+        for nom, fonction in OPERATIONS.items():
+            b_effectif = exposant(nom_jeu) if nom in ("puissance", "calcul_complexe") else b
+            resultats[f"micro.{nom}.{nom_jeu}.ns"] = mesurer(fonction, a, b_effectif, duree_min=duree_min)
+        # grand exposant fixe : le module garde les calculs intermédiaires à la taille des opérandes
+        arguments = (a, exposant(nom_jeu), b) if nom_jeu == "float" else (a, 65537, b + 1)
+        resultats[f"micro.puissance_modulaire.{nom_jeu}.ns"] = mesurer(puissance_modulaire, *arguments, duree_min=duree_min)
+    return resultats
+
+if __name__ == "__main__":
+    for cle, valeur in executer().items():
+        print(f"{cle:45} {valeur:12.1f}")
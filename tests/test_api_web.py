@@ -0,0 +1,115 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import json
+import unittest
+from app import metriques
+from web.app_web import app, cache
+
+class TestApiWeb(unittest.TestCase):
+    def setUp(self):
+        self.client = app.test_client()
+
+    def test_calcul_json(self):
+        reponse = self.client.post("/api/calcul", json={"a": 10, "operation": "division", "b": 2})
+        self.assertEqual(reponse.get_json(), {"resultat": 5.0})
+
+    def test_calcul_json_invalide(self):
+        reponse = self.client.post("/api/calcul", data="{", content_type="application/json")
+        self.assertEqual(reponse.status_code, 400)
+
+    def test_calcul_ndjson(self):
+        corps = "\n".join(json.dumps(e) for e in [
+            {"a": 2, "operation": "puissance", "b": 3},
+            {"a": 10, "operation": "modulo", "b": 0},
+            {"a": 2, "operation": "calcul_complexe", "b": 3},
+            {"a": 1, "operation": "racine", "b": 1},
+            {"a": "x", "operation": "addition", "b": 1},
+            {"a": "nan", "operation": "addition", "b": 1},
+            {"a": 1e308, "operation": "division", "b": 1e-308},
+            {"a": -8, "operation": "puissance", "b": 0.5},
+        ]) + "\n"
+        reponse = self.client.post("/api/calcul", data=corps, content_type="application/x-ndjson")
+        self.assertEqual(reponse.mimetype, "application/x-ndjson")
+        lignes = [json.loads(l) for l in reponse.get_data(as_text=True).splitlines()]
+        self.assertEqual(lignes, [
+            {"resultat": 8.0},
+            {"erreur": "Erreur : Modulo par zéro impossible"},
+            {"resultat": 18.0},
+            {"erreur": "Erreur : Opération inconnue : racine"},
+            {"erreur": "Erreur : Veuillez entrer des nombres valides."},
+            {"erreur": "Erreur : Veuillez entrer des nombres valides."},
+            {"erreur": "Erreur : Résultat non représentable en JSON."},
+            {"erreur": "Erreur : Résultat non représentable en JSON."},
+        ])
+
+    def test_formulaire_modulo(self):
+        reponse = self.client.post("/", data={"a": "10", "operation": "modulo", "b": "3"})
+        self.assertIn("Résultat : 1.0", reponse.get_data(as_text=True))
+
+    def test_page_vide_etag(self):
+        reponse = self.client.get("/")
+        self.assertIn("Calculatrice Web", reponse.get_data(as_text=True))
+        reponse = self.client.get("/", headers={"If-None-Match": reponse.headers["ETag"]})
+        self.assertEqual(reponse.status_code, 304)
+
+    def test_formulaire_cache(self):
+        succes = cache.succes
+        for _ in range(2):
+            reponse = self.client.post("/", data={"a": "10", "operation": "division", "b": "0"})
+            self.assertIn("Erreur : Division par zéro impossible", reponse.get_data(as_text=True))
+        self.assertEqual(cache.succes, succes + 1)
+
+    def test_metriques(self):
+        self.client.post("/", data={"a": "1", "operation": "modulo", "b": "0"})
+        texte = self.client.get("/metrics").get_data(as_text=True)
+        self.assertIn('calculatrice_erreurs_total{operation="modulo",type="modulo_par_zero"}', texte)
+        self.assertIn('calculatrice_requete_phase_duree_secondes_count{route="/",phase="calcul"}', texte)
+
+    def test_profilage(self):
+        self.assertEqual(self.client.post("/profilage").status_code, 404)
+        app.config["PROFILAGE_AUTORISE"] = True
+        try:
+            self.client.post("/profilage?taux=1&duree=60")
+            self.client.post("/", data={"a": "7", "operation": "addition", "b": "5"})
+            self.client.delete("/profilage")
+            reponse = self.client.get("/profilage")
+            self.assertEqual(reponse.status_code, 200)
+            self.assertEqual(reponse.mimetype, "application/octet-stream")
+        finally:
+            app.config["PROFILAGE_AUTORISE"] = False
+
+    def test_feuilles(self):
+        reponse = self.client.post("/feuilles", json={"cellules": {
+            "a": 10, "b": 4, "c": {"operation": "modulo", "a": "a", "b": "b"},
+        }})
+        self.assertEqual(reponse.status_code, 201)
+        identifiant = reponse.get_json()["id"]
+        self.assertEqual(reponse.get_json()["cellules"]["c"], {"valeur": 2})
+
+        reponse = self.client.patch(f"/feuilles/{identifiant}", json={"cellules": {"b": 0}})
+        self.assertEqual(reponse.get_json()["modifiees"], {
+            "b": {"valeur": 0}, "c": {"erreur": "Modulo par zéro impossible"},
+        })
+        reponse = self.client.patch(f"/feuilles/{identifiant}", json={"cellules": {
+            "a": {"operation": "addition", "a": "c", "b": 1},
+        }})
+        self.assertEqual(reponse.status_code, 400)
+        self.assertEqual(self.client.get(f"/feuilles/{identifiant}").get_json()["cellules"]["a"], {"valeur": 10})
+
+        self.assertEqual(app.test_client().get(f"/feuilles/{identifiant}").status_code, 404)
+        self.assertEqual(self.client.post("/feuilles", json=[1]).status_code, 400)
+
+    def test_feuilles_calculs(self):
+        appels = metriques.OPERATIONS_TOTAL.valeur(operation="puissance")
+        reponse = self.client.post("/feuilles", json={"cellules": {
+            "a": {"operation": "puissance", "a": 10, "b": 5000},
+        }})
+        self.assertEqual(reponse.status_code, 201)
+        self.assertEqual(reponse.get_json()["cellules"]["a"], {"erreur": "Résultat trop grand pour être affiché"})
+        self.assertEqual(self.client.get(f"/feuilles/{reponse.get_json()['id']}").status_code, 200)
+        self.assertEqual(metriques.OPERATIONS_TOTAL.valeur(operation="puissance"), appels + 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,30 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+from benchmarks.charge import client_en_processus, percentile
+from benchmarks.lancer import comparer, erreurs
+
+class TestBenchmarks(unittest.TestCase):
+    def test_percentile(self):
+        valeurs = list(range(1, 101))
+        self.assertAlmostEqual(percentile(valeurs, 50), 50.5)
+        self.assertAlmostEqual(percentile(valeurs, 99), 99.01)
+        self.assertEqual(percentile([], 95), 0.0)
+
+    def test_comparer(self):
+        reference = {"micro.addition.int.ns": 100, "charge.socket.debit": 1000, "charge.socket.p99_ms": 10}
+        resultats = {"micro.addition.int.ns": 130, "charge.socket.debit": 700, "charge.socket.p99_ms": 9}
+        regressions = [cle for cle, *_ in comparer(reference, resultats, 0.2)]
+        self.assertEqual(regressions, ["micro.addition.int.ns", "charge.socket.debit"])
+        self.assertEqual(comparer(reference, resultats, 0.5), [])
+
+    def test_erreurs(self):
+        latences, echecs = [], []
+        client_en_processus(20, 0, latences, echecs)
+        self.assertEqual((len(latences), echecs), (20, []))
+        self.assertEqual(erreurs({"charge.socket.erreurs": 3, "charge.processus.erreurs": 0}), ["charge.socket.erreurs"])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,47 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import tempfile
+import time
+import unittest
+from app.cache import CacheLRU, CacheSqlite
+
+class TestCacheLRU(unittest.TestCase):
+    def creer(self, taille, ttl=None):
+        return CacheLRU(taille, ttl)
+
+    def test_succes_et_echecs(self):
+        cache = self.creer(2)
+        self.assertIsNone(cache.obtenir("a"))
+        cache.enregistrer("a", b"1")
+        self.assertEqual(cache.obtenir("a"), b"1")
+        self.assertEqual((cache.succes, cache.echecs), (1, 1))
+
+    def test_eviction_lru(self):
+        cache = self.creer(2)
+        cache.enregistrer("a", b"1")
+        time.sleep(0.01)
+        cache.enregistrer("b", b"2")
+        time.sleep(0.01)
+        cache.obtenir("a")
+        time.sleep(0.01)
+        cache.enregistrer("c", b"3")
+        self.assertIsNone(cache.obtenir("b"))
+        self.assertEqual(cache.obtenir("a"), b"1")
+        self.assertEqual(len(cache), 2)
+
+    def test_expiration(self):
+        cache = self.creer(2, ttl=0.05)
+        cache.enregistrer("a", b"1")
+        time.sleep(0.1)
+        self.assertIsNone(cache.obtenir("a"))
+
+class TestCacheSqlite(TestCacheLRU):
+    def creer(self, taille, ttl=None):
+        dossier = tempfile.TemporaryDirectory()
+        self.addCleanup(dossier.cleanup)
+        return CacheSqlite(os.path.join(dossier.name, "cache.db"), taille, ttl)
+
+if __name__ == "__main__":
+    unittest.main()
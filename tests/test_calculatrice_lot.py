@@ -0,0 +1,95 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+import numpy as np
+from app.calculatrice import addition, soustraction, multiplication, division, puissance, modulo, calcul_complexe
+from app.calculatrice_lot import addition_lot, soustraction_lot, multiplication_lot, division_lot, puissance_lot, modulo_lot, calcul_complexe_lot
+
+class TestCalculatriceLot(unittest.TestCase):
+    def verifier(self, fonction_lot, fonction, a, b):
+        resultat = fonction_lot(np.array(a), np.array(b))
+        self.assertEqual(resultat.tolist(), [fonction(x, y) for x, y in zip(a, b)])
+
+    def test_addition(self):
+        self.verifier(addition_lot, addition, [3, -1], [4, 1])
+
+    def test_soustraction(self):
+        self.verifier(soustraction_lot, soustraction, [10, 0], [3, 5])
+
+    def test_multiplication(self):
+        self.verifier(multiplication_lot, multiplication, [5, -2], [6, 3])
+
+    def test_division(self):
+        resultat, erreurs = division_lot(np.array([10, 5]), np.array([2, 0]))
+        self.assertEqual(resultat[0], division(10, 2))
+        self.assertEqual(erreurs.tolist(), [False, True])
+        with self.assertRaises(ValueError):
+            division(5, 0)
+
+    def test_puissance(self):
+        self.verifier(puissance_lot, puissance, [2, 5], [3, 0])
+        self.verifier(puissance_lot, puissance, [2, 4], [-1, 2])
+
+    def test_modulo(self):
+        resultat, erreurs = modulo_lot(np.array([10, 10, -7]), np.array([3, 0, 2]))
+        self.assertEqual(resultat[[0, 2]].tolist(), [modulo(10, 3), modulo(-7, 2)])
+        self.assertEqual(erreurs.tolist(), [False, True, False])
+
+    def test_calcul_complexe(self):
+        self.verifier(calcul_complexe_lot, calcul_complexe, [2, 3], [3, 2])
+
+    def test_diffusion(self):
+        resultat, erreurs = division_lot(np.array([[1.0], [2.0]]), np.array([1.0, 0.0]))
+        self.assertEqual(resultat.shape, (2, 2))
+        self.assertEqual(erreurs.tolist(), [[False, True], [False, True]])
+
+    def test_depassement_int64(self):
+        self.verifier(puissance_lot, puissance, [2, 3], [100, 50])
+        self.verifier(multiplication_lot, multiplication, [2 ** 40, -3], [2 ** 40, 2 ** 62])
+        self.verifier(addition_lot, addition, [2 ** 62, 1], [2 ** 62, 2])
+        self.verifier(soustraction_lot, soustraction, [-2 ** 63, 0], [1, 2])
+        self.verifier(calcul_complexe_lot, calcul_complexe, [2, 10], [70, 20])
+
+    def test_petits_entiers(self):
+        a, b = np.array([2, 250], dtype=np.uint8), np.array([8, 10], dtype=np.uint8)
+        self.assertEqual(calcul_complexe_lot(a, b).tolist(), [calcul_complexe(2, 8), calcul_complexe(250, 10)])
+        self.assertEqual(addition_lot(a, b).tolist(), [10, 260])
+
+    def test_division_grands_entiers(self):
+        resultat, erreurs = division_lot(np.array([2 ** 60 + 1]), np.array([3]))
+        self.assertEqual(resultat.tolist(), [division(2 ** 60 + 1, 3)])
+        resultat, erreurs = modulo_lot(np.array([2 ** 64 - 1], dtype=np.uint64), np.array([-7]))
+        self.assertEqual(resultat.tolist(), [modulo(2 ** 64 - 1, -7)])
+
+    def test_puissance_erreurs(self):
+        with self.assertRaises(ZeroDivisionError):
+            puissance(0, -1)
+        with self.assertRaises(ZeroDivisionError):
+            puissance_lot(np.array([0, 2]), np.array([-1, 2]))
+        with self.assertRaises(OverflowError):
+            puissance(10.0, 400)
+        with self.assertRaises(OverflowError):
+            puissance_lot(np.array([10.0]), np.array([400]))
+
+    def test_scalaires(self):
+        resultat, erreurs = division_lot(2 ** 60, 3)
+        self.assertEqual((resultat.item(), erreurs.item()), (division(2 ** 60, 3), False))
+        resultat, erreurs = modulo_lot(2 ** 70, 3)
+        self.assertEqual((resultat.item(), erreurs.item()), (modulo(2 ** 70, 3), False))
+        self.assertTrue(modulo_lot(np.array(2 ** 70), np.array(0))[1].item())
+        self.assertEqual(puissance_lot(2 ** 70, 2).item(), puissance(2 ** 70, 2))
+        self.assertEqual(addition_lot(2 ** 63, 1).item(), addition(2 ** 63, 1))
+
+    def test_float32(self):
+        a, b = np.array([1.0, 2.0], dtype=np.float32), np.array([3.0, 7.0], dtype=np.float32)
+        resultat, _ = division_lot(a, b)
+        self.assertEqual(resultat.tolist(), [division(1.0, 3.0), division(2.0, 7.0)])
+
+    def test_protocole_buffer(self):
+        tampon = memoryview(bytearray(np.array([1.0, 2.0]).tobytes())).cast("d")
+        self.assertEqual(addition_lot(tampon, 1).tolist(), [2.0, 3.0])
+
+if __name__ == "__main__":
+    unittest.main()
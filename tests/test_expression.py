@@ -0,0 +1,70 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import unittest
+from app.calculatrice import OPERATIONS, puissance, modulo, calcul_complexe
+from app.expression import compiler, evaluer, evaluer_lot
+from app.ordonnanceur import CalculInterrompu, Ordonnanceur
+
+class TestExpression(unittest.TestCase):
+    def test_evaluer(self):
+        self.assertEqual(evaluer("a ^ b + 10", a=2, b=3), calcul_complexe(2, 3))
+        self.assertEqual(evaluer("(a - b) % c", a=10, b=3, c=4), modulo(7, 4))
+        self.assertEqual(evaluer("-2 ^ 2"), -4)
+        self.assertEqual(evaluer("2 ^ 3 ^ 2"), puissance(2, 9))
+        self.assertEqual(evaluer("calcul_complexe(a, 1) * 2", a=3), 26)
+
+    def test_pliage_des_constantes(self):
+        plan = compiler("2 * 3 + a")
+        self.assertEqual(plan.constantes, (6,))
+        self.assertEqual(len(plan.instructions), 1)
+
+    def test_sous_expressions_communes(self):
+        plan = compiler("(a + b) * (a + b)")
+        self.assertEqual([instruction[0] for instruction in plan.instructions], ["addition", "multiplication"])
+        self.assertEqual(plan.evaluer(a=1, b=2), 9)
+
+    def test_plan_en_cache(self):
+        self.assertIs(compiler("a + 1"), compiler("a + 1"))
+
+    def test_evaluer_lot(self):
+        self.assertEqual(evaluer_lot("a ^ b + 10", a=[2, 3], b=[3, 2]).tolist(), [18, 19])
+        self.assertEqual(evaluer_lot("(a - b) % 4", a=[10, 11], b=3).tolist(), [3, 0])
+
+    def test_lot_identique_au_scalaire(self):
+        self.assertEqual(evaluer_lot("a ^ 70", a=[2, 3]).tolist(), [evaluer("a ^ 70", a=2), evaluer("a ^ 70", a=3)])
+        self.assertEqual(evaluer_lot("a % b", a=2 ** 70, b=3).item(), evaluer("a % b", a=2 ** 70, b=3))
+
+    def test_variables_reservees(self):
+        self.assertEqual(evaluer("formule + self + executer", formule=2, self=3, executer=4), 9)
+        self.assertEqual(evaluer_lot("formule * 2", formule=[1, 2]).tolist(), [2, 4])
+
+    def test_division_par_zero(self):
+        with self.assertRaises(ValueError):
+            evaluer("a / (b - 1)", a=5, b=1)
+        with self.assertRaises(ValueError):
+            evaluer("1 % 0")
+        with self.assertRaises(ValueError):
+            evaluer_lot("a / b", a=[1, 2], b=[1, 0])
+
+    def test_expression_invalide(self):
+        for formule in ["a +", "(a", "a b", "a $ b", "racine(a, b)", ""]:
+            with self.assertRaises(ValueError):
+                compiler(formule)
+        with self.assertRaises(ValueError):
+            evaluer("a + b", a=1)
+
+    def test_formule_trop_imbriquee(self):
+        with self.assertRaises(ValueError):
+            compiler("(" * 2000 + "a" + ")" * 2000)
+        with self.assertRaises(ValueError):
+            compiler(" + ".join(["a"] * 5000))
+
+    def test_calcul_couteux_ordonnance(self):
+        ordonnanceur = Ordonnanceur(delai=0.5)
+        with self.assertRaises(CalculInterrompu):
+            evaluer("a ^ b", lambda a, operation, b: ordonnanceur.executer(OPERATIONS[operation], a, b), a=3, b=10 ** 12)
+
+if __name__ == "__main__":
+    unittest.main()
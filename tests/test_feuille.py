@@ -0,0 +1,119 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import tempfile
+import unittest
+from app.calculatrice import OPERATIONS
+from app.feuille import Feuille, ReferenceCirculaire, StockageFeuillesSqlite
+
+class TestFeuille(unittest.TestCase):
+    def setUp(self):
+        self.feuille = Feuille()
+        self.feuille.mettre_a_jour({
+            "x": 2,
+            "y": 3,
+            "z": {"operation": "puissance", "a": "x", "b": "y"},
+            "t": {"operation": "addition", "a": "z", "b": 10},
+        })
+
+    def test_valeurs(self):
+        self.assertEqual(self.feuille.lire("z"), {"valeur": 8})
+        self.assertEqual(self.feuille.lire("t"), {"valeur": 18})
+
+    def test_recalcul_incremental(self):
+        modifiees = self.feuille.definir_valeur("y", 4)
+        self.assertEqual(list(modifiees), ["y", "z", "t"])
+        self.assertEqual(modifiees["t"], {"valeur": 26})
+        self.assertNotIn("x", self.feuille.definir_valeur("y", 5))
+
+    def test_erreurs_propagees(self):
+        self.feuille.definir_formule("q", "division", "t", "zero")
+        self.assertEqual(self.feuille.lire("q"), {"erreur": "Cellule inconnue : zero"})
+        self.feuille.definir_valeur("zero", 0)
+        self.assertEqual(self.feuille.lire("q"), {"erreur": "Division par zéro impossible"})
+        self.feuille.definir_formule("r", "addition", "q", 1)
+        self.assertEqual(self.feuille.lire("r"), {"erreur": "Division par zéro impossible"})
+        self.feuille.definir_valeur("zero", 2)
+        self.assertEqual(self.feuille.lire("r"), {"valeur": 10.0})
+
+    def test_reference_circulaire(self):
+        with self.assertRaises(ReferenceCirculaire):
+            self.feuille.definir_formule("x", "addition", "t", 1)
+        with self.assertRaises(ReferenceCirculaire):
+            self.feuille.definir_formule("u", "addition", "u", 1)
+        self.assertEqual(self.feuille.lire("x"), {"valeur": 2})
+
+    def test_mise_a_jour_tout_ou_rien(self):
+        with self.assertRaises(ValueError):
+            self.feuille.mettre_a_jour({"x": 5, "y": {"operation": "addition", "a": "t", "b": 1}})
+        self.assertEqual(self.feuille.lire("x"), {"valeur": 2})
+        self.assertEqual(self.feuille.lire("t"), {"valeur": 18})
+
+    def test_grande_chaine(self):
+        feuille = Feuille()
+        definitions = {"c0": 1}
+        for i in range(1, 20000):
+            definitions[f"c{i}"] = {"operation": "addition", "a": f"c{i - 1}", "b": 1}
+        definitions["fin"] = {"operation": "multiplication", "a": "c19999", "b": 2}
+        feuille.mettre_a_jour(definitions)
+        self.assertEqual(feuille.lire("fin"), {"valeur": 40000})
+        self.assertEqual(list(feuille.definir_valeur("c19999", 0)), ["c19999", "fin"])
+
+    def test_resultat_trop_grand(self):
+        self.feuille.mettre_a_jour({
+            "g": {"operation": "puissance", "a": 10, "b": 5000},
+            "h": {"operation": "addition", "a": "g", "b": 1},
+        })
+        self.assertEqual(self.feuille.lire("g"), {"erreur": "Résultat trop grand pour être affiché"})
+        self.assertEqual(self.feuille.lire("h"), {"erreur": "Résultat trop grand pour être affiché"})
+
+class TestStockageFeuillesSqlite(unittest.TestCase):
+    def setUp(self):
+        dossier = tempfile.TemporaryDirectory()
+        self.addCleanup(dossier.cleanup)
+        self.chemin = os.path.join(dossier.name, "feuilles.sqlite3")
+
+    def test_partage_et_annulation(self):
+        stockage = StockageFeuillesSqlite(self.chemin)
+        stockage.mettre_a_jour("f", {"x": 2, "y": {"operation": "multiplication", "a": "x", "b": 3}}, creer=True)
+        # une autre instance, comme dans un autre processus
+        autre = StockageFeuillesSqlite(self.chemin)
+        self.assertEqual(list(autre.mettre_a_jour("f", {"x": 5})), ["x", "y"])
+        with self.assertRaises(ReferenceCirculaire):
+            stockage.mettre_a_jour("f", {"z": 7, "x": {"operation": "addition", "a": "y", "b": 1}})
+        self.assertEqual(stockage.lire("f"), {"x": {"valeur": 5}, "y": {"valeur": 15}})
+        with self.assertRaises(KeyError):
+            stockage.lire("inconnue")
+        with self.assertRaises(KeyError):
+            stockage.mettre_a_jour("inconnue", {"x": 1})
+
+    def test_calcul_hors_verrou(self):
+        stockage, autre = StockageFeuillesSqlite(self.chemin), StockageFeuillesSqlite(self.chemin)
+        stockage.mettre_a_jour("f", {"x": 1}, creer=True)
+        appels = []
+
+        def executer(a, operation, b):
+            # pendant le calcul, un autre processus lit la feuille puis la modifie
+            if not appels:
+                self.assertEqual(autre.lire("f"), {"x": {"valeur": 1}})
+                autre.mettre_a_jour("f", {"x": 10})
+            appels.append(a)
+            return OPERATIONS[operation](a, b)
+
+        modifiees = stockage.mettre_a_jour("f", {"y": {"operation": "addition", "a": "x", "b": 1}}, executer)
+        # la version a changé pendant le calcul : il est refait sur la feuille à jour
+        self.assertEqual(appels, [1, 10])
+        self.assertEqual(modifiees, {"y": {"valeur": 11}})
+        self.assertEqual(stockage.lire("f"), {"x": {"valeur": 10}, "y": {"valeur": 11}})
+
+    def test_eviction(self):
+        stockage = StockageFeuillesSqlite(self.chemin, taille=2)
+        for identifiant in ("a", "b", "c"):
+            stockage.mettre_a_jour(identifiant, {"x": 1}, creer=True)
+        with self.assertRaises(KeyError):
+            stockage.lire("a")
+        self.assertEqual(stockage.lire("c"), {"x": {"valeur": 1}})
+
+if __name__ == "__main__":
+    unittest.main()
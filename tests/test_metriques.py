@@ -0,0 +1,79 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import json
+import tempfile
+import unittest
+from app.calculatrice import division
+from app.metriques import Compteur, Histogramme, Registre, mesurer_operation, ERREURS_TOTAL, OPERATIONS_TOTAL
+from app.profilage import ProfilageEchantillonne
+
+class TestMetriques(unittest.TestCase):
+    def test_export_prometheus(self):
+        registre = Registre()
+        compteur = registre.enregistrer(Compteur("appels_total", "Appels.", ("operation",)))
+        histogramme = registre.enregistrer(Histogramme("duree_secondes", "Durée.", seuils=(0.1, 1.0)))
+        compteur.incrementer(operation='a"b')
+        histogramme.observer(0.5)
+        histogramme.observer(2.0)
+        texte = registre.exporter()
+        self.assertIn("# TYPE appels_total counter", texte)
+        self.assertIn('appels_total{operation="a\\"b"} 1', texte)
+        self.assertIn('duree_secondes_bucket{le="0.1"} 0', texte)
+        self.assertIn('duree_secondes_bucket{le="1.0"} 1', texte)
+        self.assertIn('duree_secondes_bucket{le="+Inf"} 2', texte)
+        self.assertIn("duree_secondes_count 2", texte)
+
+    def test_mesurer_operation(self):
+        appels = OPERATIONS_TOTAL.valeur(operation="division")
+        erreurs = ERREURS_TOTAL.valeur(operation="division", type="division_par_zero")
+        with self.assertRaises(ValueError):
+            with mesurer_operation("division"):
+                division(1, 0)
+        self.assertEqual(OPERATIONS_TOTAL.valeur(operation="division"), appels + 1)
+        self.assertEqual(ERREURS_TOTAL.valeur(operation="division", type="division_par_zero"), erreurs + 1)
+
+    def test_profilage(self):
+        profilage = ProfilageEchantillonne()
+        self.assertIsNone(profilage.exporter())
+        profilage.activer(taux=1.0)
+        profil = profilage.debut_requete()
+        division(1, 2)
+        profilage.fin_requete(profil)
+        self.assertEqual(profilage.requetes, 1)
+        self.assertIsNotNone(profilage.exporter())
+
+    def test_agregation_processus(self):
+        with tempfile.TemporaryDirectory() as dossier:
+            registre = Registre(dossier)
+            compteur = registre.enregistrer(Compteur("appels_total", "Appels.", ("operation",)))
+            histogramme = registre.enregistrer(Histogramme("duree_secondes", "Durée.", seuils=(1.0,)))
+            compteur.incrementer(operation="addition")
+            histogramme.observer(0.5)
+            # état déposé par un autre processus
+            with open(os.path.join(dossier, "metriques-1.json"), "w", encoding="utf-8") as fichier:
+                json.dump({"appels_total": [[["addition"], 2]], "duree_secondes": [[[], [0, 1], 2.0]]}, fichier)
+            texte = registre.exporter()
+            self.assertIn('appels_total{operation="addition"} 3', texte)
+            self.assertIn('duree_secondes_bucket{le="1.0"} 1', texte)
+            self.assertIn("duree_secondes_count 2", texte)
+            self.assertIn("duree_secondes_sum 2.5", texte)
+
+    def test_profilage_partage(self):
+        with tempfile.TemporaryDirectory() as dossier:
+            pilote, autre = ProfilageEchantillonne(dossier), ProfilageEchantillonne(dossier)
+            pilote.activer(taux=1.0, duree=60)
+            autre.actualiser()
+            self.assertTrue(autre.actif)
+            profil = autre.debut_requete()
+            division(1, 2)
+            autre.fin_requete(profil)
+            autre.sauvegarder()
+            self.assertIsNotNone(pilote.exporter())
+            pilote.desactiver()
+            autre.actualiser(forcer=True)
+            self.assertFalse(autre.actif)
+
+if __name__ == "__main__":
+    unittest.main()
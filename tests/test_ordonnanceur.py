@@ -0,0 +1,39 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import time
+import unittest
+from app.calculatrice import addition, division, puissance, puissance_modulaire
+from app.ordonnanceur import CalculInterrompu, Ordonnanceur, estimer_cout
+
+class TestOrdonnanceur(unittest.TestCase):
+    def test_estimer_cout(self):
+        self.assertLess(estimer_cout(puissance, 2.0, 10 ** 9), 1 << 20)
+        self.assertGreater(estimer_cout(puissance, 3, 10 ** 9), 1 << 20)
+
+    def test_appel_leger_en_ligne(self):
+        ordonnanceur = Ordonnanceur()
+        self.assertEqual(ordonnanceur.executer(addition, 3, 4), 7)
+        with self.assertRaises(ValueError):
+            ordonnanceur.executer(division, 5, 0)
+
+    def test_appel_couteux_isole(self):
+        ordonnanceur = Ordonnanceur(seuil_bits=64)
+        self.assertEqual(ordonnanceur.executer(puissance, 3, 100), 3 ** 100)
+
+    def test_delai_depasse(self):
+        ordonnanceur = Ordonnanceur(delai=0.5)
+        debut = time.monotonic()
+        with self.assertRaises(CalculInterrompu):
+            ordonnanceur.executer(puissance, 3, 10 ** 10)
+        self.assertLess(time.monotonic() - debut, 5)
+
+    def test_puissance_modulaire(self):
+        self.assertEqual(puissance_modulaire(3, 10 ** 10, 1000), pow(3, 10 ** 10, 1000))
+        self.assertEqual(puissance_modulaire(2.0, 3, 5), 3.0)
+        with self.assertRaises(ValueError):
+            puissance_modulaire(2, 3, 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,187 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import http.client
+import json
+import re
+import signal
+import subprocess
+import tempfile
+import time
+import unittest
+from types import SimpleNamespace
+from unittest import mock
+from web.serveur import preparer_partage
+
+SERVEUR = os.path.join(os.path.dirname(__file__), '..', 'web', 'serveur.py')
+
+APPLICATION = """
+def app(environ, start_response):
+    start_response("200 OK", [("Content-Type", "text/plain"), ("Content-Length", "2")])
+    return [b"{version}"]
+"""
+
+class TestPreparerPartage(unittest.TestCase):
+    def test_nettoyage_limite_aux_metriques(self):
+        with tempfile.TemporaryDirectory() as dossier:
+            noms = ("metriques-12.json", "metriques-12.json.12.tmp", "profil-1-12.prof", "profilage.json", "autre.json")
+            for nom in noms:
+                open(os.path.join(dossier, nom), "w").close()
+            with mock.patch.dict(os.environ, {"CALCULATRICE_METRIQUES_DOSSIER": dossier}):
+                self.assertIsNone(preparer_partage(SimpleNamespace(workers=1)))
+            self.assertEqual(os.listdir(dossier), ["autre.json"])
+
+@unittest.skipUnless(hasattr(os, "fork"), "os.fork indisponible")
+class TestServeur(unittest.TestCase):
+    def setUp(self):
+        self.lancer()
+
+    def lancer(self, *arguments, env=None):
+        self.processus = subprocess.Popen(
+            [sys.executable, SERVEUR, "--port", "0", "--workers", "2", "--delai", "2", "--arret", "5", *arguments],
+            stderr=subprocess.PIPE, text=True, start_new_session=True,
+            env=dict(os.environ, CALCULATRICE_CLE_SECRETE="test", **(env or {})),
+        )
+        self.addCleanup(self.processus.stderr.close)
+        self.addCleanup(self.arreter, self.processus)
+        ligne = self.processus.stderr.readline()
+        self.port = int(re.search(r":(\d+) ", ligne).group(1))
+
+    def arreter(self, processus):
+        # arrêt normal, puis tout le groupe de processus en dernier recours : aucun travailleur ne survit au test
+        if processus.poll() is None:
+            processus.send_signal(signal.SIGTERM)
+            try:
+                processus.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                pass
+        try:
+            os.killpg(processus.pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+        processus.wait()
+
+    def requete(self, connexion, methode="GET", corps=None, chemin="/", entetes=None):
+        entetes = entetes or ({"Content-Type": "application/x-www-form-urlencoded"} if corps else {})
+        for _ in range(50):
+            try:
+                connexion.request(methode, chemin, body=corps, headers=entetes)
+                reponse = connexion.getresponse()
+                self.entetes = reponse.headers
+                return reponse.status, reponse.read().decode("utf-8")
+            except ConnectionError:
+                connexion.close()
+                time.sleep(0.1)
+        self.fail("serveur injoignable")
+
+    def test_requetes_rechargement_et_arret(self):
+        connexion = http.client.HTTPConnection("127.0.0.1", self.port, timeout=5)
+        self.assertEqual(self.requete(connexion)[0], 200)
+        statut, page = self.requete(connexion, "POST", "a=10&operation=division&b=2")
+        self.assertIn("Résultat : 5.0", page)
+        connexion.close()
+
+        self.processus.send_signal(signal.SIGHUP)
+        connexion = http.client.HTTPConnection("127.0.0.1", self.port, timeout=5)
+        self.assertEqual(self.requete(connexion)[0], 200)
+        connexion.close()
+
+        self.processus.send_signal(signal.SIGTERM)
+        self.assertEqual(self.processus.wait(timeout=10), 0)
+
+    def test_metriques_agregees(self):
+        # chaque nouvelle connexion peut tomber sur l'un ou l'autre processus
+        for a in range(6):
+            connexion = http.client.HTTPConnection("127.0.0.1", self.port, timeout=5)
+            self.requete(connexion, "POST", f"a={a}&operation=modulo&b=0")
+            connexion.close()
+        time.sleep(1.5)
+        for _ in range(4):
+            connexion = http.client.HTTPConnection("127.0.0.1", self.port, timeout=5)
+            _, texte = self.requete(connexion, chemin="/metrics")
+            connexion.close()
+            self.assertIn('calculatrice_operations_total{operation="modulo"} 6', texte)
+
+    def test_feuilles_partagees(self):
+        connexion = http.client.HTTPConnection("127.0.0.1", self.port, timeout=5)
+        corps = json.dumps({"cellules": {"a": 10, "b": {"operation": "multiplication", "a": "a", "b": 2}}})
+        statut, texte = self.requete(connexion, "POST", corps, "/feuilles", {"Content-Type": "application/json"})
+        connexion.close()
+        self.assertEqual(statut, 201)
+        identifiant = json.loads(texte)["id"]
+        cookie = {"Cookie": self.entetes["Set-Cookie"].split(";")[0]}
+        # chaque nouvelle connexion peut tomber sur l'un ou l'autre processus
+        for a in range(6):
+            connexion = http.client.HTTPConnection("127.0.0.1", self.port, timeout=5)
+            corps = json.dumps({"cellules": {"a": a}})
+            statut, texte = self.requete(connexion, "PATCH", corps, f"/feuilles/{identifiant}",
+                                         dict(cookie, **{"Content-Type": "application/json"}))
+            connexion.close()
+            self.assertEqual(statut, 200)
+            self.assertEqual(json.loads(texte)["modifiees"]["b"], {"valeur": 2 * a})
+
+    def test_travailleurs_orphelins(self):
+        connexion = http.client.HTTPConnection("127.0.0.1", self.port, timeout=5)
+        self.assertEqual(self.requete(connexion)[0], 200)
+        connexion.close()
+        self.processus.kill()
+        self.processus.wait()
+        for _ in range(50):
+            try:
+                connexion = http.client.HTTPConnection("127.0.0.1", self.port, timeout=1)
+                connexion.request("GET", "/")
+                connexion.getresponse().read()
+                connexion.close()
+            except ConnectionError:
+                return
+            time.sleep(0.1)
+        self.fail("les travailleurs ont survécu au maître")
+
+    def test_rechargement_en_erreur(self):
+        dossier = tempfile.TemporaryDirectory()
+        self.addCleanup(dossier.cleanup)
+        module = os.path.join(dossier.name, "application_test.py")
+
+        def ecrire(texte):
+            with open(module, "w", encoding="utf-8") as fichier:
+                fichier.write(texte)
+
+        ecrire(APPLICATION.format(version="v1"))
+        self.lancer("--application", "application_test:app",
+                    env={"PYTHONPATH": dossier.name, "PYTHONDONTWRITEBYTECODE": "1"})
+        connexion = http.client.HTTPConnection("127.0.0.1", self.port, timeout=5)
+        self.assertEqual(self.requete(connexion)[1], "v1")
+        connexion.close()
+
+        # la nouvelle génération ne peut pas démarrer : l'ancienne continue de servir
+        ecrire("raise ImportError('application cassée')\n")
+        self.processus.send_signal(signal.SIGHUP)
+        time.sleep(1.5)
+        for _ in range(4):
+            connexion = http.client.HTTPConnection("127.0.0.1", self.port, timeout=5)
+            self.assertEqual(self.requete(connexion)[1], "v1")
+            connexion.close()
+
+        ecrire(APPLICATION.format(version="v2"))
+        self.processus.send_signal(signal.SIGHUP)
+        for _ in range(50):
+            connexion = http.client.HTTPConnection("127.0.0.1", self.port, timeout=5)
+            version = self.requete(connexion)[1]
+            connexion.close()
+            if version == "v2":
+                return
+            time.sleep(0.1)
+        self.fail("la nouvelle génération n'a pas pris le relais")
+
+    def test_cle_secrete_exigee(self):
+        environnement = {nom: valeur for nom, valeur in os.environ.items() if nom != "CALCULATRICE_CLE_SECRETE"}
+        resultat = subprocess.run(
+            [sys.executable, SERVEUR, "--port", "0", "--workers", "2"],
+            env=environnement, capture_output=True, text=True, timeout=30,
+        )
+        self.assertNotEqual(resultat.returncode, 0)
+        self.assertIn("CALCULATRICE_CLE_SECRETE", resultat.stderr)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import json
+import tempfile
+import unittest
+from concurrent.futures import Future
+from app.calculatrice import OPERATIONS
+from app.traitement_fichiers import _executer, decouper, traiter_fichier
+
+class Interruption(Exception):
+    pass
+
+class ProgressionInterrompue:
+    def __init__(self, apres):
+        self.apres = apres
+
+    def avancer(self, lignes, blocs_faits, blocs_total, forcer=False):
+        if blocs_faits >= self.apres:
+            raise Interruption()
+
+class ExecuteurTemoin:
+    # exécute sur-le-champ et retient le plus grand nombre de blocs soumis et pas encore rendus
+    def __init__(self):
+        self.soumis = 0
+        self.rendus = 0
+        self.maximum = 0
+
+    def submit(self, fonction, tache):
+        self.soumis += 1
+        self.maximum = max(self.maximum, self.soumis - self.rendus)
+        futur = Future()
+        futur.set_result(tache)
+        return futur
+
+class TestTraitementFichiers(unittest.TestCase):
+    def setUp(self):
+        dossier = tempfile.TemporaryDirectory()
+        self.addCleanup(dossier.cleanup)
+        self.dossier = dossier.name
+        self.entree = self.chemin("entree.csv")
+        operations = list(OPERATIONS) + ["racine"]
+        with open(self.entree, "w", encoding="utf-8") as fichier:
+            fichier.write("a,operation,b\n")
+            for i in range(2000):
+                fichier.write(f"{i},{operations[i % len(operations)]},{i % 5}\n")
+            fichier.write("x,addition,1\n")
+
+    def chemin(self, nom):
+        return os.path.join(self.dossier, nom)
+
+    def lire(self, nom):
+        with open(self.chemin(nom), encoding="utf-8") as fichier:
+            return fichier.read()
+
+    def test_decouper(self):
+        blocs = decouper(self.entree, 1000)
+        self.assertEqual(blocs[0][0], 0)
+        self.assertEqual(blocs[-1][1], os.path.getsize(self.entree))
+        with open(self.entree, "rb") as fichier:
+            contenu = fichier.read()
+        for debut, fin in blocs:
+            self.assertEqual(contenu[fin - 1:fin], b"\n")
+
+    def test_resultats_et_erreurs(self):
+        traiter_fichier(self.entree, self.chemin("s.csv"), self.chemin("e.csv"), processus=2, taille_bloc=1000)
+        resultats = self.lire("s.csv").splitlines()
+        erreurs = self.lire("e.csv").splitlines()
+        self.assertEqual(resultats[0], "ligne,resultat")
+        self.assertEqual(resultats[1], "2,0")
+        self.assertIn("37,Division par zéro impossible", erreurs)
+        self.assertIn("2002,Veuillez entrer des nombres valides.", erreurs)
+        self.assertEqual(len(resultats) + len(erreurs) - 2, 2001)
+        self.assertFalse(os.path.exists(self.chemin("s.csv.reprise")))
+
+    def test_desordonne_ndjson(self):
+        traiter_fichier(self.entree, self.chemin("s.ndjson"), self.chemin("e.ndjson"), processus=2, taille_bloc=1000, ordonne=False)
+        lignes = [json.loads(l) for l in self.lire("s.ndjson").splitlines()]
+        attendu = self.chemin("attendu.csv")
+        traiter_fichier(self.entree, attendu, self.chemin("attendu.err"), processus=2, taille_bloc=1000)
+        self.assertEqual(len(lignes), len(self.lire("attendu.csv").splitlines()) - 1)
+
+    def test_reprise(self):
+        sortie, erreurs = self.chemin("s.csv"), self.chemin("e.csv")
+        with self.assertRaises(Interruption):
+            traiter_fichier(self.entree, sortie, erreurs, processus=2, taille_bloc=1000,
+                            progression=ProgressionInterrompue(3))
+        self.assertTrue(os.path.exists(sortie + ".reprise"))
+        with open(sortie, "a", encoding="utf-8") as fichier:
+            fichier.write("écriture partielle")
+        traiter_fichier(self.entree, sortie, erreurs, processus=2, taille_bloc=1000, reprendre=True)
+        traiter_fichier(self.entree, self.chemin("attendu.csv"), self.chemin("attendu.err"), processus=2, taille_bloc=1000)
+        self.assertEqual(self.lire("s.csv"), self.lire("attendu.csv"))
+        self.assertEqual(self.lire("e.csv"), self.lire("attendu.err"))
+
+    def test_fenetre_bornee(self):
+        for ordonne in (True, False):
+            executeur = ExecuteurTemoin()
+            rendus = []
+            for tache in _executer(executeur, range(100), 4, ordonne):
+                executeur.rendus += 1
+                rendus.append(tache)
+            self.assertEqual(sorted(rendus), list(range(100)))
+            self.assertLessEqual(executeur.maximum, 4)
+
+    def test_calculs_demesures(self):
+        entree = self.chemin("grands.csv")
+        with open(entree, "w", encoding="utf-8") as fichier:
+            fichier.write("10,puissance,5000\n2,puissance,10000000000\n1,addition,1\n")
+        traiter_fichier(entree, self.chemin("s.csv"), self.chemin("e.csv"), processus=1, delai=1)
+        self.assertEqual(self.lire("s.csv").splitlines(), ["ligne,resultat", "3,2"])
+        erreurs = self.lire("e.csv").splitlines()
+        self.assertEqual(erreurs[1], "1,Résultat trop grand pour être écrit")
+        self.assertTrue(erreurs[2].startswith("2,Calcul interrompu"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -2,10 +2,22 @@ import sys
 import os
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from flask import Flask, request, render_template_string
-from app.calculatrice import addition, soustraction, multiplication, division, puissance
+import hashlib
+import json
+import math
+import time
+import uuid
+from flask import Flask, Response, abort, g, jsonify, request, session, stream_with_context
+from app import metriques
+from app.cache import creer_cache
+from app.calculatrice import OPERATIONS
+from app.feuille import FeuilleOccupee, creer_stockage_feuilles
+from app.ordonnanceur import Ordonnanceur
+from app.profilage import ProfilageEchantillonne
 
 app = Flask(__name__)
+# une clé aléatoire ne vaut que pour un seul processus : le serveur à plusieurs processus exige la variable
+app.secret_key = os.environ.get("CALCULATRICE_CLE_SECRETE") or os.urandom(32)
 
 HTML = """
 <!doctype html>
@@ -82,6 +94,8 @@ HTML = """
         <option value="multiplication">*</option>
         <option value="division">/</option>
         <option value="puissance">^</option>
+        <option value="modulo">%</option>
+        <option value="calcul_complexe">a^b + 10</option>
       </select>
       <input name="b" type="number" step="any" required placeholder="Nombre 2" />
       <br />
@@ -98,40 +112,237 @@ HTML = """
 </html>
 """
 
+PAGE = app.jinja_env.from_string(HTML)
+PAGE_VIDE = PAGE.render(result=None, error=None).encode("utf-8")
+ETAG_PAGE_VIDE = hashlib.sha1(PAGE_VIDE).hexdigest()
+
+cache = creer_cache(
+    taille=int(os.environ.get("CALCULATRICE_CACHE_TAILLE", 1024)),
+    ttl=float(os.environ.get("CALCULATRICE_CACHE_TTL", 300)),
+    chemin=os.environ.get("CALCULATRICE_CACHE_SQLITE"),
+)
+
+ordonnanceur = Ordonnanceur(
+    delai=float(os.environ.get("CALCULATRICE_DELAI", 5)),
+    processus_max=int(os.environ.get("CALCULATRICE_PROCESSUS_MAX", 2)),
+)
+
+metriques.registre.enregistrer(metriques.ValeurExterne(
+    "calculatrice_cache_succes_total", "Pages servies depuis le cache.", lambda: cache.succes, "counter"
+))
+metriques.registre.enregistrer(metriques.ValeurExterne(
+    "calculatrice_cache_echecs_total", "Pages absentes du cache.", lambda: cache.echecs, "counter"
+))
+
+# en mémoire par défaut ; avec plusieurs processus, CALCULATRICE_FEUILLES_SQLITE les partage
+feuilles = creer_stockage_feuilles(
+    taille=int(os.environ.get("CALCULATRICE_FEUILLES_MAX", 1000)),
+    ttl=float(os.environ.get("CALCULATRICE_FEUILLES_TTL", 3600)),
+    chemin=os.environ.get("CALCULATRICE_FEUILLES_SQLITE"),
+)
+
+# avec plusieurs processus, /metrics et /profilage ne voient tous les processus qu'à travers ce dossier partagé
+DOSSIER_METRIQUES = os.environ.get("CALCULATRICE_METRIQUES_DOSSIER")
+metriques.registre.configurer(DOSSIER_METRIQUES)
+profilage = ProfilageEchantillonne(DOSSIER_METRIQUES)
+metriques.synchronisation.ajouter(metriques.registre.sauvegarder)
+metriques.synchronisation.ajouter(profilage.sauvegarder)
+app.config["PROFILAGE_AUTORISE"] = os.environ.get("CALCULATRICE_PROFILAGE") == "1"
+
+def rendre(result=None, error=None):
+    return PAGE.render(result=result, error=error).encode("utf-8")
+
+def etiquette_operation(operation):
+    # on n'expose pas en étiquette une valeur arbitraire envoyée par le client
+    return operation if operation in OPERATIONS else "inconnue"
+
+def calculer(a, operation, b):
+    fonction = OPERATIONS.get(operation)
+    if fonction is None:
+        metriques.compter_erreur("inconnue", "operation_inconnue")
+        raise ValueError(f"Opération inconnue : {operation}")
+    with metriques.mesurer_operation(operation):
+        return ordonnanceur.executer(fonction, a, b)
+
 @app.route("/", methods=["GET", "POST"])
 def calculatrice():
     result = None
     error = None
-    if request.method == "POST":
+    if request.method == "GET":
+        reponse = Response(PAGE_VIDE, mimetype="text/html")
+        reponse.set_etag(ETAG_PAGE_VIDE)
+        return reponse.make_conditional(request)
+
+    debut = time.perf_counter()
+    try:
+        a = float(request.form["a"])
+        b = float(request.form["b"])
+    except ValueError:
+        metriques.compter_erreur(etiquette_operation(request.form.get("operation")), "entree_invalide")
+        error = "Erreur : Veuillez entrer des nombres valides."
+        return Response(rendre(result, error), mimetype="text/html")
+
+    operation = request.form["operation"]
+    debut = metriques.observer_phase("/", "analyse", debut)
+    cle = f"{a!r}|{operation}|{b!r}"
+    page = cache.obtenir(cle)
+    debut = metriques.observer_phase("/", "cache", debut)
+    if page is not None:
+        return Response(page, mimetype="text/html")
+
+    try:
+        result = calculer(a, operation, b)
+    except Exception as e:
+        error = f"Erreur : {e}"
+    debut = metriques.observer_phase("/", "calcul", debut)
+
+    page = rendre(result, error)
+    metriques.observer_phase("/", "rendu", debut)
+    cache.enregistrer(cle, page)
+    return Response(page, mimetype="text/html")
+
+def calculer_enregistrement(enregistrement):
+    try:
+        a = float(enregistrement["a"])
+        b = float(enregistrement["b"])
+        operation = enregistrement["operation"]
+        # float() accepte "nan" et "inf", que JSON ne sait pas représenter
+        if not (math.isfinite(a) and math.isfinite(b)):
+            raise ValueError(enregistrement)
+    except (KeyError, TypeError, ValueError):
+        operation = enregistrement.get("operation") if isinstance(enregistrement, dict) else None
+        metriques.compter_erreur(etiquette_operation(operation), "entree_invalide")
+        return {"erreur": "Erreur : Veuillez entrer des nombres valides."}
+    try:
+        resultat = calculer(a, operation, b)
+    except Exception as e:
+        return {"erreur": f"Erreur : {e}"}
+    # une division peut déborder en inf, une puissance donner un complexe
+    if not isinstance(resultat, float) or not math.isfinite(resultat):
+        return {"erreur": "Erreur : Résultat non représentable en JSON."}
+    return {"resultat": resultat}
+
+def lire_ndjson(flux):
+    for ligne in flux:
+        if not ligne.strip():
+            continue
         try:
-            a = float(request.form["a"])
-            b = float(request.form["b"])
+            yield json.loads(ligne)
         except ValueError:
-            error = "Erreur : Veuillez entrer des nombres valides."
-            return render_template_string(HTML, result=result, error=error)
+            yield None
 
-        operation = request.form["operation"]
-        
-        try:
-            match operation:
-                case "addition":
-                    result = addition(a, b)
-                case "soustraction":
-                    result = soustraction(a, b)
-                case "multiplication":
-                    result = multiplication(a, b)
-                case "division":
-                    result = division(a, b)
-                case "puissance":
-                    result = puissance(a, b)
-        except ValueError as e:
-            error = f"Erreur : {e}"
-            return render_template_string(HTML, result=result, error=error)
-        except Exception as e:
-            error = f"Erreur : {e}"
-            return render_template_string(HTML, result=result, error=error)
-            
-    return render_template_string(HTML, result=result, error=error)
+@app.route("/api/calcul", methods=["POST"])
+def api_calcul():
+    if request.mimetype == "application/x-ndjson":
+        def generer():
+            for enregistrement in lire_ndjson(request.stream):
+                if enregistrement is None:
+                    reponse = {"erreur": "Erreur : JSON invalide."}
+                else:
+                    reponse = calculer_enregistrement(enregistrement)
+                yield json.dumps(reponse) + "\n"
+        return Response(stream_with_context(generer()), mimetype="application/x-ndjson")
+
+    enregistrement = request.get_json(silent=True)
+    if enregistrement is None:
+        return jsonify({"erreur": "Erreur : JSON invalide."}), 400
+    return jsonify(calculer_enregistrement(enregistrement))
+
+FEUILLES_PAR_SESSION = 50
+
+def verifier_session(identifiant):
+    # une feuille n'est accessible que depuis la session qui l'a créée
+    if identifiant not in session.get("feuilles", []):
+        abort(404)
+
+def feuille_occupee():
+    return jsonify({"erreur": "Erreur : feuille occupée, réessayez."}), 503
+
+def modifier_feuille(identifiant, creer=False):
+    # renvoie l'état des cellules recalculées : à la création, toutes les cellules de la feuille ;
+    # les calculs passent par calculer() : ordonnanceur et métriques
+    donnees = request.get_json(silent=True)
+    if donnees is None:
+        donnees = {}
+    if not isinstance(donnees, dict):
+        return None, (jsonify({"erreur": "Erreur : le corps doit être un objet JSON."}), 400)
+    cellules = donnees.get("cellules", {})
+    if not isinstance(cellules, dict):
+        return None, (jsonify({"erreur": "Erreur : « cellules » doit être un objet."}), 400)
+    try:
+        return feuilles.mettre_a_jour(identifiant, cellules, executer=calculer, creer=creer), None
+    except KeyError:
+        abort(404)
+    except FeuilleOccupee:
+        return None, feuille_occupee()
+    except ValueError as e:
+        return None, (jsonify({"erreur": f"Erreur : {e}"}), 400)
+
+@app.route("/feuilles", methods=["POST"])
+def creer_feuille():
+    identifiant = uuid.uuid4().hex
+    cellules, erreur = modifier_feuille(identifiant, creer=True)
+    if erreur is not None:
+        return erreur
+    session["feuilles"] = (session.get("feuilles", []) + [identifiant])[-FEUILLES_PAR_SESSION:]
+    return jsonify({"id": identifiant, "cellules": cellules}), 201
+
+@app.route("/feuilles/<identifiant>", methods=["GET"])
+def lire_feuille(identifiant):
+    verifier_session(identifiant)
+    try:
+        return jsonify({"id": identifiant, "cellules": feuilles.lire(identifiant)})
+    except KeyError:
+        abort(404)
+    except FeuilleOccupee:
+        return feuille_occupee()
+
+@app.route("/feuilles/<identifiant>", methods=["PATCH"])
+def mettre_a_jour_feuille(identifiant):
+    verifier_session(identifiant)
+    modifiees, erreur = modifier_feuille(identifiant)
+    if erreur is not None:
+        return erreur
+    return jsonify({"id": identifiant, "modifiees": modifiees})
+
+@app.route("/metrics")
+def exporter_metriques():
+    return Response(metriques.registre.exporter(), mimetype="text/plain; version=0.0.4")
+
+@app.before_request
+def demarrer_profil():
+    if DOSSIER_METRIQUES:
+        metriques.synchronisation.assurer()
+        profilage.actualiser()
+    if profilage.actif:
+        g.profil = profilage.debut_requete()
+
+@app.teardown_request
+def arreter_profil(exception=None):
+    profil = g.pop("profil", None)
+    if profil is not None:
+        profilage.fin_requete(profil)
+
+@app.route("/profilage", methods=["GET", "POST", "DELETE"])
+def piloter_profilage():
+    if not app.config["PROFILAGE_AUTORISE"]:
+        abort(404)
+    if request.method == "POST":
+        taux = request.args.get("taux", 0.1, type=float)
+        duree = request.args.get("duree", 60, type=float)
+        profilage.activer(taux=taux, duree=duree)
+        return jsonify({"actif": True, "taux": taux, "duree": duree})
+    if request.method == "DELETE":
+        profilage.desactiver()
+        return jsonify({"actif": False})
+    donnees = profilage.exporter()
+    if donnees is None:
+        return jsonify({"erreur": "Aucun profil collecté."}), 404
+    return Response(
+        donnees,
+        mimetype="application/octet-stream",
+        headers={"Content-Disposition": "attachment; filename=calculatrice.prof"},
+    )
 
 if __name__ == "__main__":
     app.run(debug=True)
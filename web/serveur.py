@@ -0,0 +1,257 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import argparse
+import glob
+import importlib
+import select
+import shutil
+import signal
+import socket
+import tempfile
+import threading
+import time
+import traceback
+
+from werkzeug.serving import ThreadedWSGIServer, WSGIRequestHandler
+
+
+class GestionnaireRequetes(WSGIRequestHandler):
+    protocol_version = "HTTP/1.1"
+    journal = False
+
+    def log_request(self, *args, **kwargs):
+        if self.journal:
+            super().log_request(*args, **kwargs)
+
+
+class ServeurTravailleur(ThreadedWSGIServer):
+    # les connexions en cours sont terminées avant l'arrêt du travailleur
+    daemon_threads = False
+    block_on_close = True
+
+    def __init__(self, hote, application, fd, connexions_max):
+        super().__init__(hote, 0, application, GestionnaireRequetes, fd=fd)
+        self._places = threading.BoundedSemaphore(connexions_max)
+
+    def process_request(self, request, client_address):
+        self._places.acquire()
+        try:
+            super().process_request(request, client_address)
+        except BaseException:
+            self._places.release()
+            raise
+
+    def process_request_thread(self, request, client_address):
+        try:
+            super().process_request_thread(request, client_address)
+        finally:
+            self._places.release()
+
+
+def charger_application(chemin):
+    module, _, attribut = chemin.partition(":")
+    return getattr(importlib.import_module(module), attribut or "app")
+
+def surveiller_maitre(serveur, maitre):
+    # si le maître meurt sans avoir pu congédier ses travailleurs (SIGKILL), ceux-ci s'arrêtent d'eux-mêmes
+    while os.getppid() == maitre:
+        time.sleep(0.5)
+    serveur.shutdown()
+
+def travailleur(ecoute, options, pret):
+    maitre = os.getppid()
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+    GestionnaireRequetes.timeout = options.delai
+    GestionnaireRequetes.journal = options.journal
+    # importé après le fork : un rechargement prend en compte le nouveau code
+    application = charger_application(options.application)
+    serveur = ServeurTravailleur(options.hote, application, ecoute.fileno(), options.connexions)
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=serveur.shutdown).start())
+    threading.Thread(target=surveiller_maitre, args=(serveur, maitre), daemon=True).start()
+    # l'application est chargée : le maître peut congédier la génération précédente
+    os.write(pret, b"1")
+    os.close(pret)
+    serveur.serve_forever()
+    serveur.server_close()
+    os._exit(0)
+
+
+class Maitre:
+    def __init__(self, ecoute, options):
+        self.ecoute = ecoute
+        self.options = options
+        self.generation = 0
+        self.travailleurs = {}
+        self.en_arret = {}
+        self.arreter = False
+        self.recharger = False
+        # pid -> descripteur sur lequel le travailleur signale qu'il a chargé l'application
+        self.signaux = {}
+        self.prets = set()
+        self.echecs = 0
+        self.prochain_lancement = 0.0
+
+    def lancer_travailleur(self):
+        lecture, ecriture = os.pipe()
+        pid = os.fork()
+        if pid == 0:
+            os.close(lecture)
+            for descripteur in self.signaux.values():
+                os.close(descripteur)
+            try:
+                travailleur(self.ecoute, self.options, ecriture)
+            except BaseException:
+                traceback.print_exc()
+            finally:
+                os._exit(1)
+        os.close(ecriture)
+        self.signaux[pid] = lecture
+        self.travailleurs[pid] = self.generation
+
+    def attendre_signaux(self, delai):
+        prets, _, _ = select.select(list(self.signaux.values()), [], [], delai)
+        for pid, descripteur in list(self.signaux.items()):
+            if descripteur in prets:
+                if os.read(descripteur, 1):
+                    self.prets.add(pid)
+                    self.echecs = 0
+                os.close(descripteur)
+                del self.signaux[pid]
+
+    def echec_demarrage(self):
+        # un travailleur mort avant d'être prêt (erreur d'import, par exemple) : on espace les essais
+        self.echecs += 1
+        attente = min(0.1 * 2 ** self.echecs, 30.0)
+        self.prochain_lancement = time.monotonic() + attente
+        print(f"Un processus n'a pas pu démarrer ; nouvel essai dans {attente:g} s", file=sys.stderr, flush=True)
+
+    def congedier(self, pids):
+        echeance = time.monotonic() + self.options.arret
+        for pid in pids:
+            self.travailleurs.pop(pid, None)
+            self.en_arret[pid] = echeance
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    def recolter(self):
+        while True:
+            try:
+                pid, _ = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                return
+            if pid == 0:
+                return
+            if pid in self.signaux:
+                # le processus est mort : la lecture ne bloque pas, elle rend le signal s'il a été envoyé
+                descripteur = self.signaux.pop(pid)
+                if os.read(descripteur, 1):
+                    self.prets.add(pid)
+                os.close(descripteur)
+            if pid not in self.prets and pid not in self.en_arret:
+                self.echec_demarrage()
+            self.prets.discard(pid)
+            self.en_arret.pop(pid, None)
+            self.travailleurs.pop(pid, None)
+
+    def generation_courante(self):
+        return [pid for pid, generation in self.travailleurs.items() if generation == self.generation]
+
+    def executer(self):
+        signal.signal(signal.SIGTERM, self._demander_arret)
+        signal.signal(signal.SIGINT, self._demander_arret)
+        signal.signal(signal.SIGHUP, self._demander_rechargement)
+        while not self.arreter or self.travailleurs or self.en_arret:
+            if self.arreter and self.travailleurs:
+                self.congedier(list(self.travailleurs))
+            if self.recharger:
+                # la génération précédente sert les requêtes jusqu'à ce que la nouvelle soit prête
+                self.recharger = False
+                self.generation += 1
+                self.echecs = 0
+                self.prochain_lancement = 0.0
+            self.recolter()
+            courante = self.generation_courante()
+            anciens = [pid for pid in self.travailleurs if pid not in courante]
+            if anciens and sum(pid in self.prets for pid in courante) >= self.options.workers:
+                self.congedier(anciens)
+            maintenant = time.monotonic()
+            if not self.arreter and maintenant >= self.prochain_lancement:
+                for _ in range(self.options.workers - len(courante)):
+                    self.lancer_travailleur()
+            for pid, echeance in list(self.en_arret.items()):
+                if echeance < maintenant:
+                    try:
+                        os.kill(pid, signal.SIGKILL)
+                    except ProcessLookupError:
+                        pass
+            self.attendre_signaux(0.1)
+        self.ecoute.close()
+
+    def _demander_arret(self, *_):
+        self.arreter = True
+
+    def _demander_rechargement(self, *_):
+        self.recharger = True
+
+
+def analyser_arguments(argv=None):
+    parser = argparse.ArgumentParser(description="Serveur de production de la calculatrice web")
+    parser.add_argument("--hote", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=5000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="nombre de processus")
+    parser.add_argument("--connexions", type=int, default=64, help="connexions simultanées par processus")
+    parser.add_argument("--backlog", type=int, default=1024, help="file d'attente du socket d'écoute")
+    parser.add_argument("--delai", type=float, default=30, help="délai d'inactivité d'une connexion, en secondes")
+    parser.add_argument("--arret", type=float, default=30, help="délai accordé à un processus pour terminer ses requêtes")
+    parser.add_argument("--application", default="web.app_web:app")
+    parser.add_argument("--journal", action="store_true", help="journaliser chaque requête")
+    return parser.parse_args(argv)
+
+FICHIERS_METRIQUES = ("metriques-*.json", "profil-*.prof", "profilage.json")
+
+def preparer_partage(options):
+    # les processus ne partagent métriques, profils et feuilles qu'à travers des fichiers ;
+    # ceux qui ne sont pas imposés sont créés dans un dossier temporaire, supprimé à l'arrêt.
+    # Dans un dossier de métriques imposé, les fichiers d'une exécution précédente fausseraient les totaux :
+    # on supprime ceux qu'écrivent app.metriques et app.profilage, et seulement ceux-là
+    dossier = os.environ.get("CALCULATRICE_METRIQUES_DOSSIER")
+    if dossier:
+        os.makedirs(dossier, exist_ok=True)
+        for motif in FICHIERS_METRIQUES:
+            for chemin in glob.glob(os.path.join(dossier, motif)) + glob.glob(os.path.join(dossier, motif + ".*tmp")):
+                os.remove(chemin)
+    if options.workers <= 1:
+        return None
+    temporaire = tempfile.mkdtemp(prefix="calculatrice-")
+    if not dossier:
+        os.environ["CALCULATRICE_METRIQUES_DOSSIER"] = os.path.join(temporaire, "metriques")
+        os.mkdir(os.environ["CALCULATRICE_METRIQUES_DOSSIER"])
+    os.environ.setdefault("CALCULATRICE_FEUILLES_SQLITE", os.path.join(temporaire, "feuilles.sqlite3"))
+    return temporaire
+
+def main(argv=None):
+    options = analyser_arguments(argv)
+    if not hasattr(os, "fork"):
+        sys.exit("Le serveur de production nécessite os.fork (Linux, macOS).")
+    if options.workers > 1 and not os.environ.get("CALCULATRICE_CLE_SECRETE"):
+        # sinon chaque processus tire sa propre clé et rejette les sessions signées par les autres
+        sys.exit("Avec plusieurs processus, définissez CALCULATRICE_CLE_SECRETE.")
+    dossier_temporaire = preparer_partage(options)
+    ecoute = socket.create_server((options.hote, options.port), backlog=options.backlog)
+    ecoute.set_inheritable(True)
+    hote, port = ecoute.getsockname()[:2]
+    print(f"Écoute sur http://{hote}:{port} ({options.workers} processus, pid {os.getpid()})", file=sys.stderr, flush=True)
+    try:
+        Maitre(ecoute, options).executer()
+    finally:
+        if dossier_temporaire:
+            shutil.rmtree(dossier_temporaire, ignore_errors=True)
+
+if __name__ == "__main__":
+    main()